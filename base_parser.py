@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Общая часть парсеров: Comment, BaseParser с HTTP сессией, retry логикой и дедупликацией
+"""
+
+import asyncio
+import aiohttp
+import heapq
+import orjson
+import logging
+import hashlib
+import random
+import time
+from operator import attrgetter
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Set, Deque, Any, AsyncIterator, Awaitable, Iterable, Tuple
+from urllib.parse import urlsplit
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+
+try:
+    import aiodns  # aiohttp[speedups]: DNS запросы в event loop, а не в ThreadPoolExecutor
+except ImportError:
+    aiodns = None
+
+class YouTubeQuotaExceeded(Exception):
+    """Превышена дневная квота YouTube API"""
+    pass
+
+# Таблица экранирования для parse_mode='HTML' в Telegram
+_HTML = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+def make_resolver() -> Optional[aiohttp.AsyncResolver]:
+    """Асинхронный DNS резолвер на aiodns (без него aiohttp резолвит в пуле потоков)"""
+    return aiohttp.AsyncResolver() if aiodns is not None else None
+
+def _to_naive(ts: datetime) -> datetime:
+    """Приводит время к naive UTC (naive значения возвращаются как есть)"""
+    if ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _epoch(since: Optional[datetime]) -> float:
+    """Переводит naive UTC время в timestamp для сравнения с сырыми данными API (0 - без фильтра)"""
+    return since.replace(tzinfo=timezone.utc).timestamp() if since else 0.0
+
+def _preview(text: str, n: int) -> str:
+    """Обрезает текст до n символов с многоточием и экранирует HTML"""
+    if len(text) > n:
+        text = text[:n - 1] + '…'
+    return text.translate(_HTML)
+
+@dataclass(frozen=True, slots=True)
+class Comment:
+    """Класс для представления комментария (равенство и хеш по source и source_url)"""
+    author: str = field(compare=False)
+    text: str = field(compare=False)
+    source: str
+    timestamp: datetime = field(compare=False)
+    source_url: str = ""
+    # Производные поля, вычисляются один раз при создании
+    timestamp_naive: datetime = field(init=False, compare=False, repr=False)  # Для сравнения со временем запуска
+    preview_short: str = field(init=False, compare=False, repr=False)  # Превью для одиночного сообщения Telegram
+    preview_long: str = field(init=False, compare=False, repr=False)  # Превью для батча
+    time_hms: str = field(init=False, compare=False, repr=False)  # Для отчетов в консоли
+    
+    def __post_init__(self):
+        setattr_ = object.__setattr__  # Обход frozen для производных полей
+        setattr_(self, 'timestamp_naive', _to_naive(self.timestamp))
+        setattr_(self, 'preview_short', _preview(self.text, 200))
+        setattr_(self, 'preview_long', _preview(self.text, 400))
+        setattr_(self, 'time_hms', self.timestamp.strftime('%H:%M:%S'))
+    
+    def __str__(self):
+        return f"[{self.source}] {self.author}: {self.text[:50]}..."
+
+_BY_TIME = attrgetter('timestamp')  # Ключ сортировки комментариев по времени
+
+def _newest(comments: List[Comment], limit: int) -> List[Comment]:
+    """Не больше limit самых новых комментариев, новые сначала"""
+    # nlargest выбирает top-limit за O(N log limit) вместо полной сортировки
+    return heapq.nlargest(limit, comments, key=_BY_TIME)
+
+KEEPALIVE_TIMEOUT = 120  # Секунд держим простаивающее соединение открытым
+
+MAX_CONCURRENCY = 8  # Запросов в полете на хост, если парсер не задал свой семафор
+
+RETRY_MAX_DELAY = 30.0  # Потолок паузы между повторами, секунды
+
+def _backoff(prev: float, base: float) -> float:
+    """Пауза перед повтором с decorrelated jitter: случайно от base до утроенной прошлой паузы"""
+    # Случайность разводит во времени повторы параллельных запросов после общего 429
+    return min(RETRY_MAX_DELAY, random.uniform(base, max(prev, base) * 3))
+
+def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+    """Пауза, которую просит сервер (Retry-After или x-ratelimit-reset у Reddit), в секундах"""
+    for header in ('Retry-After', 'x-ratelimit-reset'):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return min(RETRY_MAX_DELAY * 2, float(value))
+            except ValueError:
+                pass
+    return None
+
+# Общая для всех задач пауза по хосту (момент по time.monotonic()): после 429/503 у одного
+# запроса остальные параллельные запросы к тому же хосту ждут вместе с ним, а не добивают лимит
+_HOST_PAUSE_UNTIL: Dict[str, float] = {}
+
+def _pause_host(host: str, seconds: float):
+    """Откладывает все запросы к хосту на seconds (уже объявленная более длинная пауза сохраняется)"""
+    until = time.monotonic() + seconds
+    if until > _HOST_PAUSE_UNTIL.get(host, 0.0):
+        _HOST_PAUSE_UNTIL[host] = until
+
+async def _wait_host(host: str):
+    """Дожидается конца паузы хоста, если она объявлена"""
+    delay = _HOST_PAUSE_UNTIL.get(host, 0.0) - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+async def _settle(awaitable: Awaitable) -> Any:
+    """Результат awaitable или его исключение (исключение возвращается, а не пробрасывается)"""
+    try:
+        return await awaitable
+    except Exception as e:
+        return e
+
+PROCESSED_COMMENTS_LIMIT = 50_000  # Сколько последних ID помнит is_new_comment
+UNIQUE_ID_TEXT_PREFIX = 256  # Сколько символов текста входит в ID комментария
+
+class BaseParser(ABC):
+    """Базовый класс для всех парсеров социальных сетей"""
+    
+    # Ограничение одновременных запросов: подклассы задают семафор своего хоста
+    _host_semaphore: asyncio.Semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    def __init__(self, source_name: str):
+        self.source_name = source_name
+        self.logger = logging.getLogger(f"parser.{source_name}")
+        self.last_check_time = None
+        # Окно обработанных ID: очередь задает порядок вытеснения, множество - поиск
+        self.processed_comments: Set[bytes] = set()
+        self._processed_order: Deque[bytes] = deque(maxlen=PROCESSED_COMMENTS_LIMIT)
+        self._session = None  # Переиспользуемая сессия
+        self._owns_session = True
+    
+    @abstractmethod
+    async def get_comments(self, limit: int = 50, since: Optional[datetime] = None) -> List[Comment]:
+        """Получает комментарии из социальной сети (since - naive UTC, более старые пропускаются)"""
+        pass
+    
+    @abstractmethod
+    def is_configured(self) -> bool:
+        """Проверяет, настроен ли парсер"""
+        pass
+    
+    def set_session(self, session: aiohttp.ClientSession):
+        """Использует общую HTTP сессию (ее закрывает владелец, а не парсер)"""
+        self._session = session
+        self._owns_session = False
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Получает или создает переиспользуемую HTTP сессию"""
+        if self._session is None or self._session.closed:
+            self._owns_session = True
+            connector = aiohttp.TCPConnector(
+                limit=100,  # Максимум соединений
+                limit_per_host=30,  # Максимум на один хост
+                ttl_dns_cache=300,  # Кэш DNS на 5 минут
+                # Простаивающие соединения переживают паузу между проверками (30-60 секунд),
+                # и очередная проверка не платит за новое TLS рукопожатие
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                resolver=make_resolver()
+            )
+            timeout = aiohttp.ClientTimeout(total=30, connect=10)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout
+            )
+        return self._session
+    
+    async def close_session(self):
+        """Закрывает HTTP сессию, если она создана самим парсером (только при остановке, не между проверками)"""
+        if self._owns_session and self._session and not self._session.closed:
+            await self._session.close()
+    
+    async def _check_forbidden(self, response: aiohttp.ClientResponse):
+        """Разбирает ответ 403 (подклассы бросают здесь исключение, которое не повторяется)"""
+        pass
+    
+    async def make_request_with_retry(
+        self,
+        method: str,
+        url: str,
+        max_retries: int = 3,
+        **kwargs
+    ) -> Optional[Dict]:
+        """Выполняет HTTP запрос с повторными попытками и возвращает JSON"""
+        session = await self._get_session()
+        host = urlsplit(url).hostname or ''
+        wait_time = 0.0
+        
+        for attempt in range(max_retries):
+            await _wait_host(host)
+            try:
+                async with self._host_semaphore, session.request(method, url, **kwargs) as response:
+                    if response.status == 200:
+                        try:
+                            # Байты разбираются orjson напрямую, без декодирования в str и stdlib json
+                            return orjson.loads(await response.read())
+                        except Exception as e:
+                            self.logger.error("Ошибка парсинга JSON ответа: %s", e)
+                            if attempt == max_retries - 1:
+                                return None
+                            wait_time = _backoff(wait_time, 1)
+                    elif response.status == 403:
+                        await self._check_forbidden(response)
+                        self.logger.error("HTTP ошибка 403 при запросе к %s", url)
+                        return None
+                    elif response.status in [429, 500, 502, 503, 504]:  # Временные ошибки
+                        if attempt == max_retries - 1:
+                            return None
+                        wait_time = _retry_after(response) or _backoff(wait_time, 1)
+                        self.logger.warning("Статус %s, повтор через %.1fс (попытка %s/%s)", response.status, wait_time, attempt + 1, max_retries)
+                        if response.status in (429, 503):
+                            # Перегружен весь хост: пауза общая, ее выдерживает _wait_host в начале попытки
+                            _pause_host(host, wait_time)
+                            continue
+                    else:
+                        self.logger.error("HTTP ошибка %s при запросе к %s", response.status, url)
+                        return None
+                # Пауза вне async with: на время ожидания соединение и слот семафора свободны
+                await asyncio.sleep(wait_time)
+            except YouTubeQuotaExceeded:
+                # Пробрасываем исключение квоты дальше, не делаем retry
+                raise
+            except asyncio.TimeoutError:
+                if attempt < max_retries - 1:
+                    wait_time = _backoff(wait_time, 1)
+                    self.logger.warning("Таймаут запроса, повтор через %.1fс (попытка %s/%s)", wait_time, attempt + 1, max_retries)
+                    await asyncio.sleep(wait_time)
+                    continue
+                else:
+                    self.logger.error("Таймаут запроса к %s после %s попыток", url, max_retries)
+                    return None
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    wait_time = _backoff(wait_time, 1)
+                    self.logger.warning("Ошибка запроса: %s, повтор через %.1fс (попытка %s/%s)", e, wait_time, attempt + 1, max_retries)
+                    await asyncio.sleep(wait_time)
+                    continue
+                else:
+                    self.logger.error("Ошибка запроса к %s: %s", url, e)
+                    return None
+        
+        return None
+    
+    async def _completed(self, requests: Iterable[Tuple[Any, Awaitable]]) -> AsyncIterator[Tuple[Any, Any]]:
+        """Выдает (ключ, результат или исключение) по мере готовности запросов, а не в порядке запуска"""
+        async def keyed(key, awaitable):
+            return key, await _settle(awaitable)
+        
+        tasks = [asyncio.create_task(keyed(key, awaitable)) for key, awaitable in requests]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # При ошибке разбора или досрочном выходе не оставляем незавершенные запросы
+            for task in tasks:
+                task.cancel()
+    
+    def get_unique_id(self, comment: Comment) -> bytes:
+        """Создает уникальный ID для комментария (16 байт BLAKE2b, стабилен между запусками)"""
+        # В отличие от hash() не зависит от PYTHONHASHSEED
+        # Источник, автор и секунда публикации почти всегда уникальны сами по себе, поэтому
+        # от текста берем только длину и начало - стоимость не растет с размером комментария
+        text = comment.text
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{comment.source}\0{comment.author}\0{int(comment.timestamp.timestamp())}\0{len(text)}\0".encode('utf-8'))
+        h.update(text[:UNIQUE_ID_TEXT_PREFIX].encode('utf-8'))
+        return h.digest()
+    
+    def is_new_comment(self, comment: Comment) -> bool:
+        """Проверяет, является ли комментарий новым"""
+        comment_id = self.get_unique_id(comment)
+        if comment_id in self.processed_comments:
+            return False
+        
+        if len(self._processed_order) == PROCESSED_COMMENTS_LIMIT:
+            self.processed_comments.discard(self._processed_order.popleft())
+        self._processed_order.append(comment_id)
+        self.processed_comments.add(comment_id)
+        return True
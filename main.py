@@ -5,25 +5,36 @@
 """
 
 import os
+import re
 import asyncio
+import aiohttp
 import logging
+import logging.handlers
+import atexit
+import queue
 import platform
-import json
 import signal
-from datetime import datetime
-from typing import List, Dict, Optional
-from collections import defaultdict
-
-# Импортируем улучшенные парсеры
-from vk_parser import create_vk_parser, Comment
-from youtube_parser import create_youtube_parser, YouTubeQuotaExceeded
-from reddit_parser import create_reddit_parser
+import time
+import orjson
+import functools
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Dict, Deque, Optional, Set, Tuple
+from collections import deque
+
+# Фабрики парсеров импортируются лениво в get_configured_parsers (только включенные)
+from base_parser import Comment, YouTubeQuotaExceeded, make_resolver, _HTML
 from telegram import Bot
+from telegram.request import HTTPXRequest
+from telegram.error import TelegramError, RetryAfter
 
 # ============================================================================
 # КОНФИГУРАЦИЯ
 # ============================================================================
 
+@functools.cache
 def detect_environment():
     """Автоматически определяет окружение"""
     if os.path.exists('/etc/systemd/system/comment-monitor.service'):
@@ -50,9 +61,45 @@ CURRENT_CONFIG = CONFIG.get(ENVIRONMENT, CONFIG['local'])
 CHECK_INTERVAL = CURRENT_CONFIG['check_interval']
 LOG_LEVEL = CURRENT_CONFIG['log_level']
 
+# Отступы в файле состояния только для локальной отладки
+STATE_OPTIONS = orjson.OPT_INDENT_2 if ENVIRONMENT == 'local' else 0
+
 LOG_FILE = 'comments_monitor_improved.log'
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
+@functools.cache
+def setup_logging():
+    """Настраивает логирование: запись в файл и консоль выполняет отдельный поток"""
+    # Логгеры только кладут запись в очередь, поэтому медленный stdout
+    # (pipe в docker/journald) не блокирует event loop
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.FileHandler(LOG_FILE, encoding='utf-8'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Полный формат применяют handlers
+    logging.basicConfig(level=getattr(logging, LOG_LEVEL), handlers=[queue_handler])
+    
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)  # Дописывает оставшиеся записи при выходе
+
+def _parse_config_file(config_path: str) -> Dict[str, str]:
+    """Разбирает config.txt в словарь ключ -> значение"""
+    text = Path(config_path).read_text(encoding='utf-8')
+    pairs = (
+        line.split('=', 1) for line in map(str.strip, text.splitlines())
+        if line and line[0] != '#' and '=' in line
+    )
+    # При повторе ключа в файле действует первое значение, как и раньше
+    config: Dict[str, str] = {}
+    for key, value in pairs:
+        config.setdefault(key.strip(), value.strip())
+    return config
+
+@functools.cache
 def load_config():
     """
     Загружает конфигурацию из файла config.txt или переменных окружения.
@@ -82,15 +129,10 @@ def load_config():
         config_path = 'config.txt'
     
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    # Используем значение из файла только если его нет в переменных окружения
-                    if key not in config:
-                        config[key] = value.strip()
+        file_config = _parse_config_file(config_path)
+        # Используем значение из файла только если его нет в переменных окружения
+        for key, value in file_config.items():
+            config.setdefault(key, value)
     except FileNotFoundError:
         # Файл не обязателен, если используются переменные окружения
         if not config:
@@ -122,40 +164,81 @@ VK_GROUP_URL = CONFIG_DATA.get('VK_GROUP_URL', '')
 REDDIT_CLIENT_ID = CONFIG_DATA.get('REDDIT_CLIENT_ID', '')
 REDDIT_CLIENT_SECRET = CONFIG_DATA.get('REDDIT_CLIENT_SECRET', '')
 REDDIT_USER_AGENT = CONFIG_DATA.get('REDDIT_USER_AGENT', '')
-REDDIT_SUBREDDITS = CONFIG_DATA.get('REDDIT_SUBREDDITS', 'python').split(',')
-
-TELEGRAM_BOT_TOKEN = CONFIG_DATA.get('TELEGRAM_BOT_TOKEN', '')
-TELEGRAM_GROUP_ID = CONFIG_DATA.get('TELEGRAM_GROUP_ID', '')
-TELEGRAM_TOPICS = {
-    'YouTube': int(CONFIG_DATA.get('TELEGRAM_TOPIC_YOUTUBE', '2')),
-    'VK': int(CONFIG_DATA.get('TELEGRAM_TOPIC_VK', '4')),
-    'Reddit': int(CONFIG_DATA.get('TELEGRAM_TOPIC_REDDIT', '6')),
-    'Errors': int(CONFIG_DATA.get('TELEGRAM_TOPIC_ERRORS', '1'))  # Топик для ошибок
-}
+REDDIT_SUBREDDITS = tuple(
+    name for name in map(str.strip, CONFIG_DATA.get('REDDIT_SUBREDDITS', 'python').split(',')) if name
+)
 
-SOCIAL_NETWORKS = {
-    'youtube': {
-        'enabled': ENABLE_YOUTUBE,
-        'api_key': YOUTUBE_API_KEY,
-        'channel_id': YOUTUBE_CHANNEL_ID,
-        'check_interval': 60
-    },
-    'vk': {
-        'enabled': ENABLE_VK,
-        'access_token': VK_ACCESS_TOKEN,
-        'group_id': VK_GROUP_ID,
-        'group_url': VK_GROUP_URL,
-        'check_interval': 30
-    },
-    'reddit': {
-        'enabled': ENABLE_REDDIT,
-        'client_id': REDDIT_CLIENT_ID,
-        'client_secret': REDDIT_CLIENT_SECRET,
-        'user_agent': REDDIT_USER_AGENT,
-        'subreddits': REDDIT_SUBREDDITS,
-        'check_interval': 30
-    }
-}
+@dataclass(frozen=True, slots=True)
+class TelegramConfig:
+    """Настройки Telegram: токен, группа и ID топиков"""
+    bot_token: str
+    group_id: str
+    youtube: int
+    vk: int
+    reddit: int
+    errors: int  # Топик для ошибок
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> 'TelegramConfig':
+        """Создает настройки из словаря конфигурации"""
+        return cls(
+            bot_token=config.get('TELEGRAM_BOT_TOKEN', ''),
+            group_id=config.get('TELEGRAM_GROUP_ID', ''),
+            youtube=int(config.get('TELEGRAM_TOPIC_YOUTUBE', '2')),
+            vk=int(config.get('TELEGRAM_TOPIC_VK', '4')),
+            reddit=int(config.get('TELEGRAM_TOPIC_REDDIT', '6')),
+            errors=int(config.get('TELEGRAM_TOPIC_ERRORS', '1'))
+        )
+
+TELEGRAM_CONFIG = TelegramConfig.from_config(CONFIG_DATA)
+TELEGRAM_BOT_TOKEN = TELEGRAM_CONFIG.bot_token
+TELEGRAM_GROUP_ID = TELEGRAM_CONFIG.group_id
+
+@dataclass(frozen=True, slots=True)
+class YouTubeConfig:
+    """Настройки YouTube парсера"""
+    enabled: bool
+    api_key: str
+    channel_id: str
+    check_interval: int = 60
+
+@dataclass(frozen=True, slots=True)
+class VKConfig:
+    """Настройки VK парсера"""
+    enabled: bool
+    access_token: str
+    group_id: str
+    group_url: str
+    check_interval: int = 30
+
+@dataclass(frozen=True, slots=True)
+class RedditConfig:
+    """Настройки Reddit парсеров (по одному на сабреддит)"""
+    enabled: bool
+    client_id: str
+    client_secret: str
+    user_agent: str
+    subreddits: Tuple[str, ...]
+    check_interval: int = 30
+
+YOUTUBE_CONFIG = YouTubeConfig(
+    enabled=ENABLE_YOUTUBE,
+    api_key=YOUTUBE_API_KEY,
+    channel_id=YOUTUBE_CHANNEL_ID
+)
+VK_CONFIG = VKConfig(
+    enabled=ENABLE_VK,
+    access_token=VK_ACCESS_TOKEN,
+    group_id=VK_GROUP_ID,
+    group_url=VK_GROUP_URL
+)
+REDDIT_CONFIG = RedditConfig(
+    enabled=ENABLE_REDDIT,
+    client_id=REDDIT_CLIENT_ID,
+    client_secret=REDDIT_CLIENT_SECRET,
+    user_agent=REDDIT_USER_AGENT,
+    subreddits=REDDIT_SUBREDDITS
+)
 
 # ============================================================================
 # КЛАССЫ ОШИБОК
@@ -173,7 +256,7 @@ class APIError(ParserError):
     """Ошибка API"""
     pass
 
-# YouTubeQuotaExceeded импортируется из youtube_parser.py
+# YouTubeQuotaExceeded импортируется из base_parser.py
 
 # ============================================================================
 # ВАЛИДАЦИЯ КОНФИГУРАЦИИ
@@ -206,154 +289,210 @@ def validate_config():
 # TELEGRAM ОТПРАВКА С БАТЧИНГОМ
 # ============================================================================
 
+# Лимиты Telegram: 30 сообщений в секунду, 4096 символов в сообщении (берем с запасом)
+TELEGRAM_RATE_LIMIT = 30
+TELEGRAM_MESSAGE_LIMIT = 3900
+TELEGRAM_POOL_SIZE = 64
+TELEGRAM_MAX_CONCURRENCY = 64
+
+class OrjsonHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest с разбором ответов Telegram через orjson"""
+    
+    @staticmethod
+    def parse_json_payload(payload: bytes) -> Dict:
+        try:
+            return orjson.loads(payload)
+        except ValueError as exc:
+            raise TelegramError("Invalid server response") from exc
+
+# Шаблоны сообщений
+_COMMENT_TPL = "💬 <b>{author}</b>\n📝 {text}\n🔗 {url}\n⏰ {time}"
+_ERROR_TPL = "⚠️ <b>ОШИБКА ПАРСЕРА</b>\n\n{parser}❌ <b>Ошибка:</b> {error}\n⏰ <b>Время:</b> {time}"
+_ERROR_PARSER_TPL = "📌 <b>Парсер:</b> {parser}\n"
+
+# Паузы между повторами отправки (по номеру попытки)
+TIMEOUT_RETRY_DELAYS = (2, 4, 6)
+ERROR_RETRY_DELAYS = (1.5, 3, 4.5)
+
+async def _with_retry(send, logger: logging.Logger, ctx: str, max_retries: int = 3) -> bool:
+    """Вызывает send() с повторами по таблице задержек, возвращает True при успехе"""
+    for attempt in range(max_retries):
+        try:
+            await send()
+            return True
+        except RetryAfter as e:
+            # Telegram сам сообщает, сколько ждать при превышении лимита
+            if attempt == max_retries - 1:
+                logger.error("Лимит Telegram при отправке %s после %d попыток", ctx, max_retries)
+                return False
+            wait_time = e.retry_after
+            if isinstance(wait_time, timedelta):
+                wait_time = wait_time.total_seconds()
+            logger.warning(
+                "Лимит Telegram при отправке %s, повтор через %sс (попытка %d/%d)",
+                ctx, wait_time, attempt + 1, max_retries
+            )
+        except asyncio.TimeoutError:
+            if attempt == max_retries - 1:
+                logger.error("Таймаут отправки %s в Telegram после %d попыток", ctx, max_retries)
+                return False
+            wait_time = TIMEOUT_RETRY_DELAYS[attempt]
+            logger.warning(
+                "Таймаут отправки %s в Telegram, повтор через %sс (попытка %d/%d)",
+                ctx, wait_time, attempt + 1, max_retries
+            )
+        except Exception as e:
+            if attempt == max_retries - 1:
+                logger.error("Ошибка отправки %s в Telegram после %d попыток: %s", ctx, max_retries, e)
+                return False
+            wait_time = ERROR_RETRY_DELAYS[attempt]
+            logger.warning(
+                "Ошибка отправки %s в Telegram: %s, повтор через %sс (попытка %d/%d)",
+                ctx, e, wait_time, attempt + 1, max_retries
+            )
+        await asyncio.sleep(wait_time)
+    return False
+
 class TelegramSender:
     """Класс для отправки сообщений в Telegram с оптимизациями"""
     
-    def __init__(self):
-        self.bot_token = TELEGRAM_BOT_TOKEN
-        self.group_id = TELEGRAM_GROUP_ID
-        self.topics = TELEGRAM_TOPICS
+    def __init__(self, cfg: TelegramConfig = TELEGRAM_CONFIG):
+        self.cfg = cfg
+        self.bot_token = cfg.bot_token
+        self.group_id = cfg.group_id
+        # Топики по имени источника в нижнем регистре ("reddit (r/python)" -> "reddit")
+        self._topic_by_source = {
+            'youtube': cfg.youtube,
+            'vk': cfg.vk,
+            'reddit': cfg.reddit,
+        }
         self.bot = None
         self.logger = logging.getLogger("telegram")
-        self._session = None
+        # Скользящее окно: каждый слот освобождается через 1с после отправки
+        self._rate_limit = asyncio.Semaphore(TELEGRAM_RATE_LIMIT)
+        # Ограничение числа одновременных отправок
+        self._sem = asyncio.Semaphore(TELEGRAM_MAX_CONCURRENCY)
     
     async def setup_bot(self):
         """Настраивает бота"""
         try:
-            self.logger.info(f"Подключение к Telegram боту...")
+            self.logger.info("Подключение к Telegram боту...")
             
-            import requests
-            response = requests.get(f"https://api.telegram.org/bot{self.bot_token}/getMe", timeout=5)
-            if response.status_code == 200:
-                bot_data = response.json()
-                if bot_data.get('ok'):
-                    self.logger.info(f"Telegram API доступен: @{bot_data['result']['username']}")
-                else:
-                    self.logger.error(f"Telegram API ошибка: {bot_data}")
-                    return False
-            else:
-                self.logger.error(f"HTTP ошибка: {response.status_code}")
+            # Пул соединений с HTTP/2: отправки переиспользуют TCP + TLS
+            self.bot = Bot(
+                token=self.bot_token,
+                request=OrjsonHTTPXRequest(connection_pool_size=TELEGRAM_POOL_SIZE, http_version='2')
+            )
+            
+            # initialize() проверяет доступность API через get_me тем же клиентом, что и для отправки;
+            # без него Bot.shutdown() в close() ничего не делает и пулы соединений остаются открытыми
+            try:
+                await self.bot.initialize()
+            except TelegramError as e:
+                self.logger.error("Telegram API ошибка: %s", e)
+                self.bot = None
                 return False
+            self.logger.info("Telegram API доступен: @%s", self.bot.bot.username)
             
-            self.bot = Bot(token=self.bot_token)
             self.logger.info("Telegram бот инициализирован")
             return True
             
         except Exception as e:
-            self.logger.error(f"Ошибка подключения к Telegram: {e}")
+            self.logger.error("Ошибка подключения к Telegram: %s", e)
             return False
     
+    def _topic(self, source: str) -> Optional[int]:
+        """Возвращает ID топика для источника (результат кэшируется по имени)"""
+        if source not in self._topic_by_source:
+            key = source.lower()
+            topic_id = self._topic_by_source.get(key)
+            if topic_id is None:
+                topic_id = self._topic_by_source.get(key.split(' ', 1)[0])
+            self._topic_by_source[source] = topic_id
+        return self._topic_by_source[source]
+    
+    async def _acquire_send_slot(self):
+        """Ждет свободный слот лимита отправки (ожидание только при приближении к лимиту)"""
+        await self._rate_limit.acquire()
+        asyncio.get_running_loop().call_later(1.0, self._rate_limit.release)
+    
+    async def _guarded(self, coro):
+        """Выполняет корутину с ограничением параллельности"""
+        async with self._sem:
+            return await coro
+    
+    async def close(self):
+        """Закрывает соединения бота"""
+        if self.bot:
+            await self.bot.shutdown()
+    
     async def send_comment(self, comment: Comment, source: str, max_retries: int = 3):
         """Отправляет один комментарий в Telegram с retry логикой"""
         if not self.bot:
             return
         
-        message = f"💬 <b>{comment.author}</b>\n"
-        message += f"📝 {comment.text[:200]}{'...' if len(comment.text) > 200 else ''}\n"
-        message += f"🔗 {comment.source_url}\n"
-        message += f"⏰ {comment.timestamp.strftime('%H:%M:%S')}"
-        
-        topic_id = None
-        if source.lower() == "youtube":
-            topic_id = self.topics.get('YouTube')
-        elif source.lower() == "vk":
-            topic_id = self.topics.get('VK')
-        elif source.lower().startswith("reddit"):
-            topic_id = self.topics.get('Reddit')
-        
-        # Retry логика для отправки в Telegram
-        for attempt in range(max_retries):
-            try:
-                if topic_id:
-                    await self.bot.send_message(
-                        chat_id=self.group_id,
-                        text=message,
-                        parse_mode='HTML',
-                        message_thread_id=topic_id
-                    )
-                else:
-                    await self.bot.send_message(
-                        chat_id=self.group_id,
-                        text=message,
-                        parse_mode='HTML'
-                    )
-                
-                # Успешная отправка
-                await asyncio.sleep(0.5)
-                return
-                
-            except asyncio.TimeoutError:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2  # 2, 4, 6 секунд
-                    self.logger.warning(
-                        f"Таймаут отправки в Telegram для {comment.author}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                    )
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Таймаут отправки в Telegram для {comment.author} после {max_retries} попыток")
-                    await asyncio.sleep(1)
-                    return
-                    
-            except Exception as e:
-                # Для других ошибок (не таймаут) тоже делаем retry
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 1.5  # 1.5, 3, 4.5 секунд
-                    self.logger.warning(
-                        f"Ошибка отправки в Telegram для {comment.author}: {e}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                    )
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Ошибка отправки в Telegram для {comment.author} после {max_retries} попыток: {e}")
-                    await asyncio.sleep(1)
-                    return
+        message = _COMMENT_TPL.format(
+            author=comment.author.translate(_HTML),
+            text=comment.preview_short,
+            url=comment.source_url.translate(_HTML),
+            time=comment.time_hms
+        )
+        
+        topic_id = self._topic(source)
+        
+        async def send():
+            await self._acquire_send_slot()
+            await self.bot.send_message(
+                chat_id=self.group_id,
+                text=message,
+                parse_mode='HTML',
+                message_thread_id=topic_id or None
+            )
+        
+        await _with_retry(send, self.logger, f"комментария от {comment.author}", max_retries)
     
     async def send_comment_batch(self, comments: List[Comment], source: str):
-        """Отправляет батч комментариев одним сообщением (опционально)"""
+        """Отправляет батч комментариев, упаковывая их в минимальное число сообщений"""
         if not comments or not self.bot:
             return
         
-        # Для небольших батчей отправляем по одному
+        # Для небольших батчей отправляем по одному, параллельно
         if len(comments) <= 3:
-            for comment in comments:
-                await self.send_comment(comment, source)
+            await asyncio.gather(*[self._guarded(self.send_comment(c, source)) for c in comments])
             return
         
         # Для больших батчей можно отправить одним сообщением
         try:
-            topic_id = None
-            if source.lower() == "youtube":
-                topic_id = self.topics.get('YouTube')
-            elif source.lower() == "vk":
-                topic_id = self.topics.get('VK')
-            elif source.lower().startswith("reddit"):
-                topic_id = self.topics.get('Reddit')
-            
-            message_parts = [f"💬 <b>{len(comments)} новых комментариев из {source}</b>\n\n"]
-            for i, comment in enumerate(comments[:10], 1):  # Показываем первые 10
-                message_parts.append(f"{i}. <b>{comment.author}</b>: {comment.text[:100]}{'...' if len(comment.text) > 100 else ''}\n")
+            topic_id = self._topic(source)
             
-            if len(comments) > 10:
-                message_parts.append(f"\n... и еще {len(comments) - 10} комментариев")
-            
-            message = "".join(message_parts)
-            
-            if topic_id:
-                await self.bot.send_message(
-                    chat_id=self.group_id,
-                    text=message,
-                    parse_mode='HTML',
-                    message_thread_id=topic_id
-                )
-            else:
-                await self.bot.send_message(
-                    chat_id=self.group_id,
-                    text=message,
-                    parse_mode='HTML'
+            # Жадно упаковываем комментарии в сообщения до лимита длины
+            messages = []
+            buf = f"💬 <b>{len(comments)} новых комментариев из {source.translate(_HTML)}</b>\n\n"
+            for i, comment in enumerate(comments, 1):
+                part = (
+                    f"{i}. <b>{comment.author.translate(_HTML)}</b>: {comment.preview_long}\n"
+                    f"🔗 {comment.source_url.translate(_HTML)}\n\n"
                 )
+                if buf and len(buf) + len(part) > TELEGRAM_MESSAGE_LIMIT:
+                    messages.append(buf)
+                    buf = ""
+                buf += part
+            if buf:
+                messages.append(buf)
+            
+            for message in messages:
+                async def send(message=message):
+                    await self._acquire_send_slot()
+                    await self.bot.send_message(
+                        chat_id=self.group_id,
+                        text=message,
+                        parse_mode='HTML',
+                        message_thread_id=topic_id or None
+                    )
+                
+                await _with_retry(send, self.logger, "батча", 3)
         except Exception as e:
-            self.logger.error(f"Ошибка отправки батча в Telegram: {e}")
+            self.logger.error("Ошибка отправки батча в Telegram: %s", e)
     
     async def send_error(self, error_message: str, parser_name: str = None, max_retries: int = 3):
         """Отправляет сообщение об ошибке в топик ошибок"""
@@ -361,89 +500,84 @@ class TelegramSender:
             self.logger.warning("Telegram бот не инициализирован, ошибка не отправлена")
             return
         
-        topic_id = self.topics.get('Errors')
-        self.logger.debug(f"Отправка ошибки в Telegram. Парсер: {parser_name}, Топик: {topic_id}")
+        topic_id = self.cfg.errors
+        self.logger.debug("Отправка ошибки в Telegram. Парсер: %s, Топик: %s", parser_name, topic_id)
         
         # Форматируем сообщение об ошибке
-        message = "⚠️ <b>ОШИБКА ПАРСЕРА</b>\n\n"
-        if parser_name:
-            message += f"📌 <b>Парсер:</b> {parser_name}\n"
-        message += f"❌ <b>Ошибка:</b> {error_message}\n"
-        message += f"⏰ <b>Время:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        # Retry логика для отправки ошибки
-        for attempt in range(max_retries):
-            try:
-                if topic_id:
-                    self.logger.debug(f"Отправка ошибки в топик {topic_id} (попытка {attempt + 1}/{max_retries})")
-                    await self.bot.send_message(
-                        chat_id=self.group_id,
-                        text=message,
-                        parse_mode='HTML',
-                        message_thread_id=topic_id
-                    )
-                else:
-                    self.logger.warning("ID топика Errors не найден, отправка без топика")
-                    await self.bot.send_message(
-                        chat_id=self.group_id,
-                        text=message,
-                        parse_mode='HTML'
-                    )
-                
-                # Успешная отправка
-                self.logger.info(f"Ошибка успешно отправлена в Telegram (попытка {attempt + 1})")
-                return
-                
-            except asyncio.TimeoutError:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2
-                    self.logger.warning(
-                        f"Таймаут отправки ошибки в Telegram, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                    )
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Таймаут отправки ошибки в Telegram после {max_retries} попыток")
-                    return
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 1.5
-                    self.logger.warning(
-                        f"Ошибка отправки ошибки в Telegram: {e}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                    )
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Ошибка отправки ошибки в Telegram после {max_retries} попыток: {e}")
-                    return
+        message = _ERROR_TPL.format(
+            parser=_ERROR_PARSER_TPL.format(parser=parser_name.translate(_HTML)) if parser_name else "",
+            error=error_message.translate(_HTML),
+            time=datetime.now().isoformat(' ', 'seconds')
+        )
+        
+        if not topic_id:
+            self.logger.warning("ID топика Errors не найден, отправка без топика")
+        
+        async def send():
+            await self._acquire_send_slot()
+            await self.bot.send_message(
+                chat_id=self.group_id,
+                text=message,
+                parse_mode='HTML',
+                message_thread_id=topic_id or None
+            )
+        
+        if await _with_retry(send, self.logger, "ошибки", max_retries):
+            self.logger.info("Ошибка успешно отправлена в Telegram")
 
 # ============================================================================
 # МОНИТОРИНГ С УЛУЧШЕНИЯМИ
 # ============================================================================
 
+# Не чаще одной записи файла состояния за этот интервал (секунды)
+STATE_SAVE_INTERVAL = 10
+
+# Сколько последних ключей комментариев помнить для дедупликации (на парсер)
+KNOWN_IDS_LIMIT = 1000
+
+_REDDIT_SUB_RE = re.compile(r'r/(\w+)')
+
+@dataclass(slots=True)
+class ParserStats:
+    """Счетчики одного парсера"""
+    checks: int = 0
+    comments_found: int = 0
+    errors: int = 0
+    last_check: Optional[float] = None  # time.monotonic()
+
+def _key(source_url: str, author: str = "", text: str = "") -> int:
+    """Стабильный 64-битный ключ комментария для дедупликации (не зависит от PYTHONHASHSEED)"""
+    # source_url содержит уникальный ID комментария во всех парсерах, автор и текст не нужны
+    # Ссылки нет только у VK без group_url - тогда остаются автор и текст
+    raw = source_url or f"{author}\0{text}"
+    return int.from_bytes(hashlib.blake2b(raw.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def _comment_key(comment: Comment) -> int:
+    """Ключ дедупликации для объекта Comment"""
+    return _key(comment.source_url, comment.author, comment.text)
+
 class CommentMonitor:
     """Улучшенный класс для мониторинга комментариев"""
     
     def __init__(self):
         # Настройка логирования ПЕРВОЙ
-        logging.basicConfig(
-            level=getattr(logging, LOG_LEVEL),
-            format=LOG_FORMAT,
-            handlers=[
-                logging.FileHandler(LOG_FILE, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        setup_logging()
         
         self.logger = logging.getLogger("monitor")
         
+        self.check_intervals: Dict[str, int] = {}  # Собственный интервал проверки каждого парсера
         self.parsers = self.get_configured_parsers()
-        self.last_comments = {}
+        # Набор парсеров фиксирован при запуске, заводим счетчики сразу
+        self.parser_stats: Dict[str, ParserStats] = {p.source_name: ParserStats() for p in self.parsers}
+        # Ключи дедупликации по парсерам: очередь задает порядок вытеснения, множество - поиск
+        self.known_ids: Dict[str, Deque[int]] = {}
+        self.known_keys: Dict[str, Set[int]] = {}
+        self._dirty = False  # Есть несохраненные изменения состояния
+        self._save_queue: asyncio.Queue = asyncio.Queue(maxsize=1)  # Запросы на запись состояния
         self.check_interval = CHECK_INTERVAL
         self.telegram_sender = TelegramSender()
+        self.session = None  # Общая HTTP сессия парсеров, создается в run()
         self.state_file = "monitor_state_improved.json"
-        self.first_run = True
         
         # Метрики
         self.stats = {
@@ -451,13 +585,7 @@ class CommentMonitor:
             'total_comments_found': 0,
             'total_comments_sent': 0,
             'total_errors': 0,
-            'parser_stats': defaultdict(lambda: {
-                'checks': 0,
-                'comments_found': 0,
-                'errors': 0,
-                'last_check': None
-            }),
-            'start_time': datetime.now()
+            'start_time': time.monotonic()
         }
         
         # Graceful shutdown
@@ -466,62 +594,77 @@ class CommentMonitor:
         # Время запуска парсера - комментарии до этого времени не отправляются
         # ВСЕГДА устанавливаем текущее время при запуске (не загружаем из файла)
         # Используем UTC для единообразия с комментариями из API
-        from datetime import timezone as tz
-        self.parser_start_time = datetime.now(tz.utc).replace(tzinfo=None)
-        self.logger.info(f"Время запуска парсера: {self.parser_start_time.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+        self.parser_start_time = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.logger.info("Время запуска парсера: %s UTC", self.parser_start_time.strftime('%Y-%m-%d %H:%M:%S'))
         
         # Загружаем состояние (комментарии, но не время запуска)
         self.load_state()
         
-        # Определяем, первый ли это запуск (если нет сохраненных комментариев)
-        if not self.last_comments:
-            self.first_run = True
+        # Первый запуск каждого парсера определяется по отсутствию его ключей в known_ids
+        if not self.known_ids:
             self.logger.debug("Первый запуск: нет сохраненных комментариев")
         else:
-            self.first_run = False
-            self.logger.debug(f"Загружено состояние для {len(self.last_comments)} парсеров")
+            self.logger.debug("Загружено состояние для %s парсеров", len(self.known_ids))
     
     def get_configured_parsers(self) -> List:
         """Возвращает список настроенных парсеров"""
         parsers = []
         
-        if SOCIAL_NETWORKS['youtube']['enabled'] and SOCIAL_NETWORKS['youtube']['api_key'] and SOCIAL_NETWORKS['youtube']['channel_id']:
-            youtube_parser = create_youtube_parser(
-                SOCIAL_NETWORKS['youtube']['api_key'],
-                SOCIAL_NETWORKS['youtube']['channel_id']
-            )
+        youtube = YOUTUBE_CONFIG
+        if youtube.enabled and youtube.api_key and youtube.channel_id:
+            from youtube_parser import create_youtube_parser
+            youtube_parser = create_youtube_parser(youtube.api_key, youtube.channel_id)
             parsers.append(youtube_parser)
+            self.check_intervals[youtube_parser.source_name] = youtube.check_interval
             self.logger.debug("YouTube парсер добавлен")
         
-        if SOCIAL_NETWORKS['vk']['enabled'] and SOCIAL_NETWORKS['vk']['access_token'] and SOCIAL_NETWORKS['vk']['group_id']:
-            vk_parser = create_vk_parser(
-                SOCIAL_NETWORKS['vk']['access_token'],
-                SOCIAL_NETWORKS['vk']['group_id'],
-                SOCIAL_NETWORKS['vk']['group_url']
-            )
+        vk = VK_CONFIG
+        if vk.enabled and vk.access_token and vk.group_id:
+            from vk_parser import create_vk_parser
+            vk_parser = create_vk_parser(vk.access_token, vk.group_id, vk.group_url)
             parsers.append(vk_parser)
+            self.check_intervals[vk_parser.source_name] = vk.check_interval
             self.logger.debug("VK парсер добавлен")
         
-        if SOCIAL_NETWORKS['reddit']['enabled'] and SOCIAL_NETWORKS['reddit']['client_id'] and SOCIAL_NETWORKS['reddit']['client_secret']:
-            for subreddit in SOCIAL_NETWORKS['reddit']['subreddits']:
-                subreddit = subreddit.strip()
-                if subreddit:
-                    reddit_parser = create_reddit_parser(
-                        SOCIAL_NETWORKS['reddit']['client_id'],
-                        SOCIAL_NETWORKS['reddit']['client_secret'],
-                        SOCIAL_NETWORKS['reddit']['user_agent'],
-                        subreddit
-                    )
-                    parsers.append(reddit_parser)
-                    self.logger.debug(f"Reddit парсер для r/{subreddit} добавлен")
+        reddit = REDDIT_CONFIG
+        if reddit.enabled and reddit.client_id and reddit.client_secret:
+            from reddit_parser import create_reddit_parser
+            for subreddit in reddit.subreddits:
+                reddit_parser = create_reddit_parser(
+                    reddit.client_id,
+                    reddit.client_secret,
+                    reddit.user_agent,
+                    subreddit
+                )
+                parsers.append(reddit_parser)
+                self.check_intervals[reddit_parser.source_name] = reddit.check_interval
+                self.logger.debug("Reddit парсер для r/%s добавлен", subreddit)
         
         return parsers
     
     def save_last_comments(self, parser_name: str, comments: List[Comment]):
-        """Сохраняет последние комментарии для парсера"""
+        """Запоминает ключи последних комментариев парсера"""
         # Сохраняем все комментарии для дедупликации (включая старые)
         # Фильтрация по времени запуска происходит в get_new_comments
-        self.last_comments[parser_name] = comments[:100]
+        if self._remember(parser_name, comments):
+            self._dirty = True
+    
+    def _remember(self, parser_name: str, comments: List[Comment]) -> bool:
+        """Добавляет ключи комментариев в окно дедупликации, возвращает True при изменениях"""
+        changed = parser_name not in self.known_ids
+        ids = self.known_ids.setdefault(parser_name, deque(maxlen=KNOWN_IDS_LIMIT))
+        keys = self.known_keys.setdefault(parser_name, set())
+        # Идем от старых к новым, чтобы первыми вытеснялись самые старые ключи
+        for comment in reversed(comments):
+            key = _comment_key(comment)
+            if key in keys:
+                continue
+            if len(ids) == ids.maxlen:
+                keys.discard(ids.popleft())
+            ids.append(key)
+            keys.add(key)
+            changed = True
+        return changed
     
     def get_new_comments(self, parser_name: str, current_comments: List[Comment]) -> List[Comment]:
         """Определяет новые комментарии, фильтруя те, что были написаны до запуска парсера"""
@@ -530,70 +673,32 @@ class CommentMonitor:
         skipped_before_start = 0
         for comment in current_comments:
             # Отправляем только комментарии, написанные после запуска парсера
-            # Приводим timestamp к naive datetime для корректного сравнения
-            try:
-                comment_time = comment.timestamp
-                if comment_time.tzinfo is not None:
-                    # Если timezone-aware (например, из YouTube API), конвертируем в naive
-                    # Используем UTC для преобразования
-                    from datetime import timezone as tz
-                    comment_time = comment_time.astimezone(tz.utc).replace(tzinfo=None)
-                
-                if comment_time >= self.parser_start_time:
-                    filtered_comments.append(comment)
-                else:
-                    skipped_before_start += 1
-            except Exception as e:
-                # Если ошибка при сравнении, пропускаем комментарий
-                self.logger.warning(f"{parser_name}: ошибка сравнения времени комментария: {e}")
+            # timestamp_naive уже приведен к naive UTC при создании комментария
+            if comment.timestamp_naive >= self.parser_start_time:
+                filtered_comments.append(comment)
+            else:
                 skipped_before_start += 1
         
-        if self.first_run:
-            if skipped_before_start > 0:
-                self.logger.debug(f"{parser_name}: пропущено {skipped_before_start} старых комментариев (первый запуск)")
-            return []
-        
-        # Если парсера нет в last_comments, считаем что это первый запуск для этого парсера
-        if parser_name not in self.last_comments:
+        # Если парсера нет в known_ids, считаем что это первый запуск для этого парсера
+        if parser_name not in self.known_ids:
             if skipped_before_start > 0:
-                self.logger.debug(f"{parser_name}: пропущено {skipped_before_start} старых комментариев (первый запуск парсера)")
+                self.logger.debug("%s: пропущено %s старых комментариев (первый запуск парсера)", parser_name, skipped_before_start)
             return []
         
-        last_comments = self.last_comments[parser_name]
-        
-        known_comments = set()
-        for comment in last_comments:
-            # Для YouTube используем только source_url (содержит уникальный ID комментария)
-            # Для других парсеров используем author + text + source_url
-            if parser_name == "YouTube":
-                key = comment.source_url
-            else:
-                key = f"{comment.author}_{comment.text}_{comment.source_url}"
-            known_comments.add(key)
-        
-        new_comments = []
-        for comment in filtered_comments:
-            # Для YouTube используем только source_url (содержит уникальный ID комментария)
-            # Для других парсеров используем author + text + source_url
-            if parser_name == "YouTube":
-                key = comment.source_url
-            else:
-                key = f"{comment.author}_{comment.text}_{comment.source_url}"
-            
-            if key not in known_comments:
-                new_comments.append(comment)
+        known_keys = self.known_keys.get(parser_name, set())
+        new_comments = [c for c in filtered_comments if _comment_key(c) not in known_keys]
         
         # Логируем только важную информацию
         if new_comments:
-            self.logger.info(f"{parser_name}: {len(new_comments)} новых комментариев (всего: {len(current_comments)}, после запуска: {len(filtered_comments)})")
+            self.logger.info("%s: %s новых комментариев (всего: %s, после запуска: %s)", parser_name, len(new_comments), len(current_comments), len(filtered_comments))
         elif len(filtered_comments) > 0:
-            self.logger.debug(f"{parser_name}: новых комментариев нет (всего: {len(current_comments)}, после запуска: {len(filtered_comments)})")
+            self.logger.debug("%s: новых комментариев нет (всего: %s, после запуска: %s)", parser_name, len(current_comments), len(filtered_comments))
         elif len(current_comments) > 0:
             # Комментарии найдены, но все отфильтрованы по времени
             skipped = len(current_comments) - len(filtered_comments)
-            self.logger.info(f"{parser_name}: найдено {len(current_comments)} комментариев, все отфильтрованы по времени (пропущено: {skipped})")
+            self.logger.info("%s: найдено %s комментариев, все отфильтрованы по времени (пропущено: %s)", parser_name, len(current_comments), skipped)
         else:
-            self.logger.debug(f"{parser_name}: комментариев не найдено")
+            self.logger.debug("%s: комментариев не найдено", parser_name)
         
         return new_comments
     
@@ -604,25 +709,24 @@ class CommentMonitor:
         
         if parser_name.lower().startswith("reddit"):
             # Извлекаем сабреддит из parser_name, например "Reddit (r/python)" -> "python"
-            import re
-            match = re.search(r'r/(\w+)', parser_name)
+            match = _REDDIT_SUB_RE.search(parser_name)
             if match:
                 subreddit = match.group(1)
-                report = f"\n🆕 НОВЫЕ КОММЕНТАРИИ из REDDIT (r/{subreddit})\n"
+                parts = [f"\n🆕 НОВЫЕ КОММЕНТАРИИ из REDDIT (r/{subreddit})\n"]
             else:
-                report = f"\n🆕 НОВЫЕ КОММЕНТАРИИ из {parser_name.upper()}\n"
+                parts = [f"\n🆕 НОВЫЕ КОММЕНТАРИИ из {parser_name.upper()}\n"]
         else:
-            report = f"\n🆕 НОВЫЕ КОММЕНТАРИИ из {parser_name.upper()}\n"
+            parts = [f"\n🆕 НОВЫЕ КОММЕНТАРИИ из {parser_name.upper()}\n"]
         
-        report += "=" * 50 + "\n"
+        parts.append("=" * 50 + "\n")
         
         for i, comment in enumerate(new_comments, 1):
             text = comment.text.replace('\n', ' ').replace('<br>', ' ')[:60]
-            report += f"{i}. {comment.author}: {text}...\n"
-            report += f"   🔗 {comment.source_url}\n"
-            report += f"   ⏰ {comment.timestamp.strftime('%H:%M:%S')}\n\n"
+            parts.append(f"{i}. {comment.author}: {text}...\n")
+            parts.append(f"   🔗 {comment.source_url}\n")
+            parts.append(f"   ⏰ {comment.time_hms}\n\n")
         
-        return report
+        return "".join(parts)
     
     async def _check_single_parser(self, parser) -> Dict:
         """Проверяет один парсер (для параллельного выполнения)"""
@@ -634,17 +738,20 @@ class CommentMonitor:
             'error': None
         }
         
+        stats = self.parser_stats[parser_name]
         try:
-            self.stats['parser_stats'][parser_name]['checks'] += 1
-            self.stats['parser_stats'][parser_name]['last_check'] = datetime.now()
+            stats.checks += 1
+            stats.last_check = time.monotonic()
             
             # Для Reddit: до 20 комментариев с каждого из 20 постов = до 400 комментариев
             # Для других: до 30 комментариев с каждого из 20 постов/видео = до 600 комментариев
             per_parser_limit = 400 if parser_name.startswith("Reddit") else 600
-            comments = await parser.get_comments(limit=per_parser_limit)
+            # Комментарии до запуска парсер отбрасывает сам, не создавая для них Comment
+            comments = await parser.get_comments(limit=per_parser_limit, since=self.parser_start_time)
             
             if comments:
-                self.stats['parser_stats'][parser_name]['comments_found'] += len(comments)
+                stats.comments_found += len(comments)
+                self.stats['total_comments_found'] += len(comments)
                 new_comments = self.get_new_comments(parser_name, comments)
                 
                 result['comments'] = comments
@@ -653,107 +760,105 @@ class CommentMonitor:
                 if new_comments:
                     limited_comments = new_comments[:10]
                     if len(new_comments) > 10:
-                        self.logger.info(f"{parser_name}: ограничено до 10 комментариев из {len(new_comments)}")
+                        self.logger.info("%s: ограничено до 10 комментариев из %s", parser_name, len(new_comments))
                     
-                    # Отправляем комментарии
-                    for comment in limited_comments:
-                        await self.telegram_sender.send_comment(comment, parser_name)
-                        self.stats['total_comments_sent'] += 1
+                    # Отправляем комментарии батчем
+                    await self.telegram_sender.send_comment_batch(limited_comments, parser_name)
+                    self.stats['total_comments_sent'] += len(limited_comments)
                     
-                    report = self.format_report(parser_name, new_comments)
-                    if report:
-                        print(report)
+                    # Отчет идет через логгер, а не print - без блокирующей записи в stdout,
+                    # и не собирается вовсе, если уровень INFO отключен
+                    if self.logger.isEnabledFor(logging.INFO):
+                        report = self.format_report(parser_name, new_comments)
+                        if report:
+                            self.logger.info("%s", report)
                 
                 self.save_last_comments(parser_name, comments)
             else:
-                self.logger.debug(f"{parser_name}: комментариев не найдено")
+                self.logger.debug("%s: комментариев не найдено", parser_name)
                 self.save_last_comments(parser_name, [])
                 
         except YouTubeQuotaExceeded as e:
             # Специальная обработка ошибки квоты YouTube API
             error_msg = str(e)
-            self.logger.error(f"ПЕРЕХВАЧЕНА ОШИБКА КВОТЫ YOUTUBE: {error_msg}")
+            self.logger.error("ПЕРЕХВАЧЕНА ОШИБКА КВОТЫ YOUTUBE: %s", error_msg)
             self.stats['total_errors'] += 1
-            self.stats['parser_stats'][parser_name]['errors'] += 1
+            stats.errors += 1
             result['error'] = error_msg
             
             # Отправляем ошибку в топик ошибок Telegram
             try:
                 await self.telegram_sender.send_error(error_msg, parser_name=parser_name)
             except Exception as send_err:
-                self.logger.error(f"Ошибка при отправке ошибки в Telegram: {send_err}")
+                self.logger.error("Ошибка при отправке ошибки в Telegram: %s", send_err)
             
             # Выводим сообщение в консоль
-            print(f"\n⚠️ {parser_name}: {error_msg}\n")
+            self.logger.warning("⚠️ %s: %s", parser_name, error_msg)
             
         except Exception as e:
             error_msg = f"Ошибка при проверке {parser_name}: {e}"
             self.logger.error(error_msg)
             self.stats['total_errors'] += 1
-            self.stats['parser_stats'][parser_name]['errors'] += 1
+            stats.errors += 1
             result['error'] = str(e)
             
             # Отправляем ошибку в топик ошибок Telegram
-            await self.telegram_sender.send_error(error_msg, parser_name=parser_name)
+            try:
+                await self.telegram_sender.send_error(error_msg, parser_name=parser_name)
+            except Exception as send_err:
+                self.logger.error("Ошибка при отправке ошибки в Telegram: %s", send_err)
         
         return result
     
-    async def check_parsers(self):
-        """Проверяет все парсеры ПАРАЛЛЕЛЬНО"""
-        self.stats['total_checks'] += 1
-        
-        if not self.parsers:
-            self.logger.warning("Нет активных парсеров для проверки")
-            return
+    async def _parser_loop(self, parser):
+        """Проверяет один парсер в собственном ритме, не дожидаясь остальных"""
+        parser_name = parser.source_name
+        interval = self.check_intervals.get(parser_name, self.check_interval)
+        first_check = True
         
-        # Создаем задачи для параллельного выполнения
-        tasks = [self._check_single_parser(parser) for parser in self.parsers]
-        
-        # Выполняем все парсеры параллельно
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Обрабатываем результаты
-        for result in results:
-            if isinstance(result, Exception):
-                # Специальная обработка для YouTubeQuotaExceeded
-                if isinstance(result, YouTubeQuotaExceeded):
-                    error_msg = str(result)
-                    self.logger.error(f"Критическая ошибка парсера (квота YouTube): {error_msg}")
-                    self.stats['total_errors'] += 1
-                    # Отправляем ошибку в Telegram
-                    await self.telegram_sender.send_error(error_msg, parser_name="YouTube")
-                else:
-                    error_msg = f"Критическая ошибка парсера: {result}"
-                    self.logger.error(error_msg)
-                    self.stats['total_errors'] += 1
-                    # Отправляем ошибку в Telegram
-                    await self.telegram_sender.send_error(str(result), parser_name="Unknown")
-                continue
+        while not self.shutdown_event.is_set():
+            await self._check_single_parser(parser)
+            self.stats['total_checks'] += 1
             
-            parser_name = result['parser_name']
-            if result['comments']:
-                self.stats['total_comments_found'] += len(result['comments'])
-        
-        # Сохраняем состояние ОДИН раз после всех проверок
-        self.save_state()
-        
-        # Выводим статистику каждые 10 проверок
-        if self.stats['total_checks'] % 10 == 0:
-            self.print_stats()
+            if first_check:
+                first_check = False
+                self.logger.info("%s: первая проверка завершена, теперь будут отправляться только новые комментарии", parser_name)
+            
+            # Запись состояния выполняет отдельная задача, здесь только запрос
+            if self._dirty and self._save_queue.empty():
+                self._save_queue.put_nowait(None)
+            
+            # Выводим статистику примерно каждые 10 проверок каждого парсера
+            if self.stats['total_checks'] % (10 * len(self.parsers)) == 0:
+                self.print_stats()
+            
+            self.logger.debug("%s: ожидание %s секунд...", parser_name, interval)
+            try:
+                await asyncio.wait_for(self.shutdown_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass  # Таймаут ожидания истек, продолжаем цикл
+    
+    async def _state_writer(self):
+        """Сохраняет состояние по запросу, не чаще раза в STATE_SAVE_INTERVAL секунд"""
+        while True:
+            await self._save_queue.get()
+            if self._dirty:
+                self.save_state()
+            await asyncio.sleep(STATE_SAVE_INTERVAL)
     
     def print_stats(self):
         """Выводит статистику работы"""
-        uptime = datetime.now() - self.stats['start_time']
+        uptime = timedelta(seconds=int(time.monotonic() - self.stats['start_time']))
         self.logger.info("=" * 50)
         self.logger.info("СТАТИСТИКА МОНИТОРИНГА")
-        self.logger.info(f"Время работы: {uptime}")
-        self.logger.info(f"Всего проверок: {self.stats['total_checks']}")
-        self.logger.info(f"Всего комментариев найдено: {self.stats['total_comments_found']}")
-        self.logger.info(f"Всего комментариев отправлено: {self.stats['total_comments_sent']}")
-        self.logger.info(f"Всего ошибок: {self.stats['total_errors']}")
+        self.logger.info("Время работы: %s", uptime)
+        self.logger.info("Всего проверок: %s", self.stats['total_checks'])
+        self.logger.info("Всего комментариев найдено: %s", self.stats['total_comments_found'])
+        self.logger.info("Всего комментариев отправлено: %s", self.stats['total_comments_sent'])
+        self.logger.info("Всего ошибок: %s", self.stats['total_errors'])
         self.logger.info("-" * 50)
-        for parser_name, stats in self.stats['parser_stats'].items():
-            self.logger.info(f"{parser_name}: проверок={stats['checks']}, найдено={stats['comments_found']}, ошибок={stats['errors']}")
+        for parser_name, stats in self.parser_stats.items():
+            self.logger.info("%s: проверок=%s, найдено=%s, ошибок=%s", parser_name, stats.checks, stats.comments_found, stats.errors)
         self.logger.info("=" * 50)
     
     async def run(self):
@@ -769,7 +874,18 @@ class CommentMonitor:
             return
         
         self.logger.info("Telegram бот подключен успешно")
-        self.logger.info(f"Запуск мониторинга {len(self.parsers)} парсеров...")
+        
+        # Одна сессия на все парсеры: общий пул соединений, DNS кэш и TLS сессии
+        # keepalive_timeout больше самого длинного интервала проверки (60 секунд),
+        # чтобы соединения не закрывались между проверками
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=30, ttl_dns_cache=300, keepalive_timeout=120,
+                                     resolver=make_resolver()),
+            timeout=aiohttp.ClientTimeout(total=30, connect=10)
+        )
+        for parser in self.parsers:
+            parser.set_session(self.session)
+        self.logger.info("Запуск мониторинга %s парсеров...", len(self.parsers))
         
         # Устанавливаем обработчики сигналов для graceful shutdown
         try:
@@ -778,36 +894,29 @@ class CommentMonitor:
                 for sig in (signal.SIGTERM, signal.SIGINT):
                     loop.add_signal_handler(sig, lambda: self.shutdown_event.set())
         except Exception as e:
-            self.logger.warning(f"Не удалось установить обработчики сигналов: {e}")
+            self.logger.warning("Не удалось установить обработчики сигналов: %s", e)
         
         try:
-            while not self.shutdown_event.is_set():
-                await self.check_parsers()
-                
-                if self.first_run:
-                    self.first_run = False
-                    self.logger.info("Первый запуск завершен, теперь будут отправляться только новые комментарии")
-                
-                self.logger.info(f"Ожидание {self.check_interval} секунд...")
+            if not self.parsers:
+                self.logger.warning("Нет активных парсеров для проверки")
+            
+            # У каждого парсера свой цикл: медленный парсер не задерживает быстрые
+            async with asyncio.TaskGroup() as tg:
+                for parser in self.parsers:
+                    tg.create_task(self._parser_loop(parser))
+                writer = tg.create_task(self._state_writer())
                 
-                # Проверяем shutdown_event во время ожидания
                 try:
-                    await asyncio.wait_for(
-                        self.shutdown_event.wait(),
-                        timeout=self.check_interval
-                    )
-                    # Если событие установлено, выходим из цикла
-                    break
-                except asyncio.TimeoutError:
-                    pass  # Таймаут ожидания истек, продолжаем цикл
+                    await self.shutdown_event.wait()
                 except asyncio.CancelledError:
                     self.logger.info("Получен сигнал отмены")
-                    break
+                    self.shutdown_event.set()
+                writer.cancel()
                 
         except KeyboardInterrupt:
             self.logger.info("Получен сигнал остановки (Ctrl+C)")
         except Exception as e:
-            self.logger.error(f"Критическая ошибка: {e}")
+            self.logger.error("Критическая ошибка: %s", e)
         finally:
             self.logger.info("Завершение работы мониторинга...")
             
@@ -816,7 +925,15 @@ class CommentMonitor:
                 try:
                     await parser.close_session()
                 except Exception as e:
-                    self.logger.warning(f"Ошибка закрытия сессии парсера {parser.source_name}: {e}")
+                    self.logger.warning("Ошибка закрытия сессии парсера %s: %s", parser.source_name, e)
+            
+            if self.session and not self.session.closed:
+                await self.session.close()
+            
+            try:
+                await self.telegram_sender.close()
+            except Exception as e:
+                self.logger.warning("Ошибка закрытия сессии Telegram: %s", e)
             
             # Сохраняем состояние
             self.save_state()
@@ -827,22 +944,19 @@ class CommentMonitor:
         """Загружает состояние из файла"""
         try:
             if os.path.exists(self.state_file):
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    restored_comments = {}
+                with open(self.state_file, 'rb') as f:
+                    data = orjson.loads(f.read())
+                    for source, keys in data.get('known_ids', {}).items():
+                        ids = deque(keys[-KNOWN_IDS_LIMIT:], maxlen=KNOWN_IDS_LIMIT)
+                        self.known_ids[source] = ids
+                        self.known_keys[source] = set(ids)
+                    
+                    # Миграция со старого формата, где хранились комментарии целиком
                     for source, comments_data in data.get('last_comments', {}).items():
-                        comments = []
-                        for comment_data in comments_data:
-                            comment = Comment(
-                                author=comment_data['author'],
-                                text=comment_data['text'],
-                                source=source,
-                                timestamp=datetime.fromisoformat(comment_data['timestamp']),
-                                source_url=comment_data['source_url']
-                            )
-                            comments.append(comment)
-                        restored_comments[source] = comments
-                    self.last_comments = restored_comments
+                        if source not in self.known_ids:
+                            keys = [_key(c['source_url'], c['author'], c.get('text', '')) for c in reversed(comments_data)]
+                            self.known_ids[source] = deque(keys, maxlen=KNOWN_IDS_LIMIT)
+                            self.known_keys[source] = set(keys)
                     
                     # НЕ загружаем время запуска из файла - оно всегда устанавливается в текущее время при запуске
                     # Время запуска в файле используется только для информации
@@ -850,45 +964,38 @@ class CommentMonitor:
                         saved_time = datetime.fromisoformat(data['parser_start_time'])
                         if saved_time.tzinfo is not None:
                             saved_time = saved_time.replace(tzinfo=None)
-                        self.logger.debug(f"В файле сохранено время предыдущего запуска: {saved_time.strftime('%Y-%m-%d %H:%M:%S')} (не используется)")
+                        self.logger.debug("В файле сохранено время предыдущего запуска: %s (не используется)", saved_time.strftime('%Y-%m-%d %H:%M:%S'))
                     
                     self.logger.info("Состояние загружено из файла")
             else:
                 # Файл состояния не существует - будет установлено в __init__
                 self.logger.info("Файл состояния не найден, будет создан новый")
         except Exception as e:
-            self.logger.error(f"Ошибка загрузки состояния: {e}")
+            self.logger.error("Ошибка загрузки состояния: %s", e)
             # При ошибке загрузки оставляем None, будет установлено в __init__
     
     def save_state(self):
         """Сохраняет состояние в файл"""
         try:
-            json_comments = {}
-            for source, comments in self.last_comments.items():
-                json_comments[source] = []
-                for comment in comments:
-                    json_comments[source].append({
-                        'author': comment.author,
-                        'text': comment.text,
-                        'source': comment.source,
-                        'timestamp': comment.timestamp.isoformat(),
-                        'source_url': comment.source_url
-                    })
-            
             data = {
-                'last_comments': json_comments,
-                'timestamp': datetime.now().isoformat(),
-                'parser_start_time': self.parser_start_time.isoformat() if self.parser_start_time else datetime.now().isoformat(),  # Сохраняем время запуска
+                # Для дедупликации достаточно ключей, от старых к новым
+                'known_ids': {source: list(ids) for source, ids in self.known_ids.items()},
+                'timestamp': datetime.now(),
+                'parser_start_time': self.parser_start_time or datetime.now(),  # Сохраняем время запуска
                 'stats': {
                     'total_checks': self.stats['total_checks'],
                     'total_comments_found': self.stats['total_comments_found'],
                     'total_comments_sent': self.stats['total_comments_sent']
                 }
             }
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # Пишем во временный файл и атомарно подменяем, чтобы сбой не оставил пустой файл
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(data, option=STATE_OPTIONS))
+            os.replace(tmp_file, self.state_file)
+            self._dirty = False
         except Exception as e:
-            self.logger.error(f"Ошибка сохранения состояния: {e}")
+            self.logger.error("Ошибка сохранения состояния: %s", e)
 
 # ============================================================================
 # ГЛАВНАЯ ФУНКЦИЯ
@@ -944,8 +1051,8 @@ def main():
     
     # Создаем и запускаем монитор
     monitor = CommentMonitor()
-    monitor.logger.info(f"Инициализирован мониторинг {len(monitor.parsers)} парсеров")
-    monitor.logger.info(f"Интервал проверки: {monitor.check_interval} секунд")
+    monitor.logger.info("Инициализирован мониторинг %s парсеров", len(monitor.parsers))
+    monitor.logger.info("Интервал проверки: %s секунд", monitor.check_interval)
     
     # Запускаем мониторинг
     asyncio.run(monitor.run())
@@ -5,142 +5,59 @@
 
 import asyncio
 import aiohttp
-import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from abc import ABC, abstractmethod
+import orjson
+import hashlib
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from collections import deque
+from contextlib import aclosing
 import ssl
-import random
+import re
+import time
 
-class Comment:
-    """Класс для представления комментария"""
-    def __init__(self, author: str, text: str, source: str, timestamp: datetime, source_url: str = ""):
-        self.author = author
-        self.text = text
-        self.source = source
-        self.timestamp = timestamp
-        self.source_url = source_url
-    
-    def __str__(self):
-        return f"[{self.source}] {self.author}: {self.text[:50]}..."
+from base_parser import BaseParser, Comment, _epoch, _newest, _settle, _BY_TIME, _backoff, _retry_after, _pause_host, _wait_host
 
-class BaseParser(ABC):
-    """Базовый класс для всех парсеров социальных сетей"""
-    
-    def __init__(self, source_name: str):
-        self.source_name = source_name
-        self.logger = logging.getLogger(f"parser.{source_name}")
-        self.last_check_time = None
-        self.processed_comments = set()
-        self._session = None
-    
-    @abstractmethod
-    async def get_comments(self, limit: int = 50) -> List[Comment]:
-        """Получает комментарии из социальной сети"""
-        pass
-    
-    @abstractmethod
-    def is_configured(self) -> bool:
-        """Проверяет, настроен ли парсер"""
-        pass
-    
-    async def _get_session(self) -> aiohttp.ClientSession:
-        """Получает или создает переиспользуемую HTTP сессию"""
-        if self._session is None or self._session.closed:
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            connector = aiohttp.TCPConnector(
-                ssl=ssl_context,
-                limit=100,
-                limit_per_host=30,
-                ttl_dns_cache=300
-            )
-            timeout = aiohttp.ClientTimeout(total=30, connect=10)
-            self._session = aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            )
-        return self._session
-    
-    async def close_session(self):
-        """Закрывает HTTP сессию"""
-        if self._session and not self._session.closed:
-            await self._session.close()
-    
-    async def make_request_with_retry(
-        self,
-        method: str,
-        url: str,
-        max_retries: int = 3,
-        **kwargs
-    ) -> Optional[Dict]:
-        """Выполняет HTTP запрос с повторными попытками и возвращает JSON"""
-        session = await self._get_session()
-        
-        for attempt in range(max_retries):
-            try:
-                async with session.request(method, url, **kwargs) as response:
-                    if response.status == 200:
-                        try:
-                            data = await response.json()
-                            return data
-                        except Exception as e:
-                            self.logger.error(f"Ошибка парсинга JSON ответа: {e}")
-                            if attempt < max_retries - 1:
-                                wait_time = 2 ** attempt
-                                await asyncio.sleep(wait_time)
-                                continue
-                            return None
-                    elif response.status in [429, 500, 502, 503, 504]:
-                        if attempt < max_retries - 1:
-                            wait_time = 2 ** attempt
-                            self.logger.warning(
-                                f"Статус {response.status}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                            )
-                            await asyncio.sleep(wait_time)
-                            continue
-                    else:
-                        self.logger.error(f"HTTP ошибка {response.status} при запросе к {url}")
-                        return None
-            except asyncio.TimeoutError:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    self.logger.warning(f"Таймаут запроса, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Таймаут запроса к {url} после {max_retries} попыток")
-                    return None
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    self.logger.warning(f"Ошибка запроса: {e}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Ошибка запроса к {url}: {e}")
-                    return None
-        
+# SSL контекст для обхода проблем с сертификатами
+_SSL_CONTEXT = ssl.create_default_context()
+_SSL_CONTEXT.check_hostname = False
+_SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+
+# Увеличенный таймаут для Reddit API
+_API_TIMEOUT = aiohttp.ClientTimeout(total=45, connect=15)
+
+_API_HOST = "oauth.reddit.com"  # Ключ общей паузы после 429 (_pause_host)
+
+# Ограничение одновременных запросов к oauth.reddit.com для всех Reddit парсеров:
+# вместо случайной задержки перед каждой проверкой - фиксированное число запросов в полете
+REDDIT_MAX_CONCURRENCY = 10
+_HOST_SEMAPHORE = asyncio.Semaphore(REDDIT_MAX_CONCURRENCY)
+
+# Шаблонные (спам/бот) комментарии: длинные тексты, совпадающие после нормализации
+_NON_WORD_RE = re.compile(r'\W+')
+FORM_LETTER_MIN_LEN = 350  # Короче - не считаем шаблоном
+FORM_LETTER_PREFIX = 500  # Сравниваем только начало текста
+
+def _form_letter_key(text: str) -> Optional[bytes]:
+    """Ключ шаблонного комментария или None для коротких текстов"""
+    if len(text) < FORM_LETTER_MIN_LEN:
+        return None  # Нормализация только укорачивает текст
+    norm = _NON_WORD_RE.sub(' ', text.lower()).strip()
+    if len(norm) < FORM_LETTER_MIN_LEN:
         return None
-    
-    def get_unique_id(self, comment: Comment) -> str:
-        """Создает уникальный ID для комментария"""
-        return f"{comment.source}_{comment.author}_{comment.timestamp}_{hash(comment.text)}"
-    
-    def is_new_comment(self, comment: Comment) -> bool:
-        """Проверяет, является ли комментарий новым"""
-        comment_id = self.get_unique_id(comment)
-        if comment_id in self.processed_comments:
-            return False
-        
-        self.processed_comments.add(comment_id)
-        return True
+    return hashlib.blake2b(norm[:FORM_LETTER_PREFIX].encode('utf-8'), digest_size=16).digest()
+
+# Токены общие для всех парсеров с одними client_id/client_secret (обычно один на все сабреддиты)
+# Ключ - пара учетных данных, значение - токен и срок его действия по time.monotonic()
+# (монотонные часы не сбрасывают токен раньше времени при переводе системных часов)
+_TOKEN_CACHE: Dict[Tuple[str, str], Tuple[str, float]] = {}
+_TOKEN_LOCKS: Dict[Tuple[str, str], asyncio.Lock] = {}
+_TOKEN_EXPIRY_MARGIN = 300  # Обновляем токен за 5 минут до истечения
 
 class RedditParser(BaseParser):
     """Улучшенный парсер комментариев Reddit через API с кэшированием токенов"""
     
+    _host_semaphore = _HOST_SEMAPHORE
+    
     def __init__(self, client_id: str, client_secret: str, user_agent: str, subreddit: str):
         super().__init__(f"Reddit (r/{subreddit})")
         self.client_id = client_id
@@ -148,57 +65,74 @@ class RedditParser(BaseParser):
         self.user_agent = user_agent
         self.subreddit = subreddit
         self.access_token = None
-        self.token_expires_at = None  # Время истечения токена
-        self.base_url = "https://oauth.reddit.com"
+        self._recent_post_ids: List[str] = []  # Посты предыдущей проверки для упреждающей загрузки
+        self.base_url = f"https://{_API_HOST}"
+        # Неизменные части путей и ссылок сабреддита собираем один раз
+        self._new_endpoint = f"/r/{subreddit}/new"
+        self._comments_endpoint = f"/r/{subreddit}/comments/"
+        self._url_prefix = f"https://reddit.com/r/{subreddit}/comments/"
         self.auth_url = "https://www.reddit.com/api/v1/access_token"
+        # Параметры запроса токена не меняются, собираем их один раз
+        self._auth = aiohttp.BasicAuth(client_id, client_secret)
+        self._auth_headers = {'User-Agent': user_agent}
+        self._auth_data = {'grant_type': 'client_credentials'}
     
     def is_configured(self) -> bool:
         """Проверяет, настроен ли парсер Reddit"""
         return bool(self.client_id and self.client_secret and self.user_agent and self.subreddit)
     
+    def _cached_token(self, key: Tuple[str, str]) -> bool:
+        """Берет валидный токен из общего кэша, если он есть"""
+        cached = _TOKEN_CACHE.get(key)
+        if cached and time.monotonic() < cached[1]:
+            self.access_token = cached[0]
+            return True
+        return False
+    
     async def get_access_token(self) -> bool:
         """Получает access token для Reddit API с кэшированием"""
         # Проверяем, не истек ли токен
-        if self.access_token and self.token_expires_at:
-            if datetime.now() < self.token_expires_at:
-                self.logger.debug("Используется существующий Reddit токен")
-                return True  # Токен еще валиден
+        key = (self.client_id, self.client_secret)
+        if self._cached_token(key):
+            return True  # Токен еще валиден
         
         if not self.is_configured():
             return False
         
-        auth = aiohttp.BasicAuth(self.client_id, self.client_secret)
-        headers = {
-            'User-Agent': self.user_agent
-        }
-        data = {
-            'grant_type': 'client_credentials'
-        }
-        
-        # Для получения токена используем отдельную сессию без SSL проблем
-        # как в старой версии, это важно для Reddit API
+        # Токен запрашивает только один парсер, остальные ждут и берут его из кэша
+        async with _TOKEN_LOCKS.setdefault(key, asyncio.Lock()):
+            if self._cached_token(key):
+                self.logger.debug("Используется Reddit токен, полученный другим парсером")
+                return True
+            return await self._fetch_access_token(key)
+    
+    async def _fetch_access_token(self, key: Tuple[str, str]) -> bool:
+        """Запрашивает новый access token и кладет его в общий кэш"""
+        # Токен запрашиваем через ту же сессию, что и данные: без отдельного TLS рукопожатия
+        session = await self._get_session()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.auth_url, auth=auth, headers=headers, data=data) as response:
-                    if response.status == 200:
-                        token_data = await response.json()
-                        self.access_token = token_data.get('access_token')
-                        expires_in = token_data.get('expires_in', 3600)
-                        # Сохраняем время истечения с запасом в 60 секунд
-                        self.token_expires_at = datetime.now() + timedelta(seconds=expires_in - 60)
-                        self.logger.info("Reddit access token получен и закэширован")
-                        return True
-                    else:
-                        self.logger.error(f"Ошибка получения Reddit token: {response.status}")
-                        return False
+            async with session.post(self.auth_url, auth=self._auth, headers=self._auth_headers, data=self._auth_data,
+                                    ssl=_SSL_CONTEXT, timeout=_API_TIMEOUT) as response:
+                if response.status == 200:
+                    token_data = orjson.loads(await response.read())
+                    self.access_token = token_data.get('access_token')
+                    expires_in = token_data.get('expires_in', 3600)
+                    # Сохраняем время истечения с запасом в 5 минут
+                    deadline = time.monotonic() + expires_in - _TOKEN_EXPIRY_MARGIN
+                    _TOKEN_CACHE[key] = (self.access_token, deadline)
+                    self.logger.info("Reddit access token получен и закэширован")
+                    return True
+                else:
+                    self.logger.error("Ошибка получения Reddit token: %s", response.status)
+                    return False
         except Exception as e:
-            self.logger.error(f"Ошибка при получении Reddit token: {e}")
+            self.logger.error("Ошибка при получении Reddit token: %s", e)
             return False
     
     async def make_api_request(self, endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Optional[Dict]:
         """Выполняет запрос к Reddit API с retry логикой для таймаутов"""
         if not await self.get_access_token():
-            self.logger.error(f"Не удалось получить токен для запроса {endpoint}")
+            self.logger.error("Не удалось получить токен для запроса %s", endpoint)
             return None
         
         url = f"{self.base_url}{endpoint}"
@@ -207,61 +141,62 @@ class RedditParser(BaseParser):
             'User-Agent': self.user_agent
         }
         
+        # Одна сессия на все запросы: keep-alive и DNS кэш коннектора
+        # избавляют от TLS рукопожатия на каждый из параллельных запросов
+        session = await self._get_session()
+        wait_time = 0.0
+        
         # Retry логика для таймаутов
         for attempt in range(max_retries):
+            await _wait_host(_API_HOST)
             try:
-                # Используем отдельную сессию для каждого запроса, как в старой версии
-                import ssl
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-                
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                # Увеличенный таймаут для Reddit API
-                timeout = aiohttp.ClientTimeout(total=45, connect=15)
-                
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                    async with session.get(url, headers=headers, params=params) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            return data
-                        elif response.status == 401:
-                            # Token expired, try to get new one
-                            self.logger.warning(f"Получен 401 для {endpoint}, обновляем токен")
-                            self.access_token = None
-                            self.token_expires_at = None
-                            if await self.get_access_token():
-                                headers['Authorization'] = f'bearer {self.access_token}'
-                                async with session.get(url, headers=headers, params=params) as retry_response:
-                                    if retry_response.status == 200:
-                                        return await retry_response.json()
-                        elif response.status == 429:
-                            # Rate limit - ждем дольше
-                            if attempt < max_retries - 1:
-                                wait_time = (attempt + 1) * 5  # 5, 10, 15 секунд
-                                self.logger.warning(f"Rate limit (429) для {endpoint}, ждем {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                                await asyncio.sleep(wait_time)
-                                continue
-                        else:
-                            self.logger.error(f"Reddit API ошибка для {endpoint}: статус {response.status}")
+                async with _HOST_SEMAPHORE, session.get(url, headers=headers, params=params, ssl=_SSL_CONTEXT, timeout=_API_TIMEOUT) as response:
+                    if response.status == 200:
+                        # orjson разбирает ответы Reddit (до сотен комментариев) в разы быстрее json
+                        return orjson.loads(await response.read())
+                    elif response.status == 401:
+                        # Token expired, try to get new one
+                        self.logger.warning("Получен 401 для %s, обновляем токен", endpoint)
+                        # Сбрасываем кэш, только если в нем тот же токен - другой парсер мог уже обновить его
+                        key = (self.client_id, self.client_secret)
+                        cached = _TOKEN_CACHE.get(key)
+                        if cached and cached[0] == self.access_token:
+                            del _TOKEN_CACHE[key]
+                        self.access_token = None
+                        # Запрос повторяется в общем цикле, с тем же лимитом попыток
+                        # (запрос токена не занимает слот семафора, поэтому ждать его можно здесь)
+                        if not await self.get_access_token():
                             return None
+                        headers['Authorization'] = f'bearer {self.access_token}'
+                        continue
+                    elif response.status == 429:
+                        # Rate limit - ждем столько, сколько просит Reddit, иначе не меньше 5 секунд
+                        if attempt < max_retries - 1:
+                            wait_time = _retry_after(response) or _backoff(wait_time, 5)
+                            self.logger.warning("Rate limit (429) для %s, ждем %.1fс (попытка %s/%s)", endpoint, wait_time, attempt + 1, max_retries)
+                            # Лимит общий для всех запросов с токеном: ждут все задачи, а не только эта
+                            _pause_host(_API_HOST, wait_time)
+                            continue
+                    else:
+                        self.logger.error("Reddit API ошибка для %s: статус %s", endpoint, response.status)
+                        return None
             except asyncio.TimeoutError:
                 if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 3  # 3, 6, 9 секунд
-                    self.logger.warning(f"Таймаут запроса к {endpoint}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
+                    wait_time = _backoff(wait_time, 3)
+                    self.logger.warning("Таймаут запроса к %s, повтор через %.1fс (попытка %s/%s)", endpoint, wait_time, attempt + 1, max_retries)
                     await asyncio.sleep(wait_time)
                     continue
                 else:
-                    self.logger.error(f"Таймаут запроса к {endpoint} после {max_retries} попыток")
+                    self.logger.error("Таймаут запроса к %s после %s попыток", endpoint, max_retries)
                     return None
             except Exception as e:
                 if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2
-                    self.logger.warning(f"Ошибка запроса к Reddit API ({endpoint}): {e}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
+                    wait_time = _backoff(wait_time, 2)
+                    self.logger.warning("Ошибка запроса к Reddit API (%s): %s, повтор через %.1fс (попытка %s/%s)", endpoint, e, wait_time, attempt + 1, max_retries)
                     await asyncio.sleep(wait_time)
                     continue
                 else:
-                    self.logger.error(f"Ошибка запроса к Reddit API ({endpoint}): {e}")
+                    self.logger.error("Ошибка запроса к Reddit API (%s): %s", endpoint, e)
                     return None
         
         return None
@@ -273,16 +208,16 @@ class RedditParser(BaseParser):
             'sort': 'new'
         }
         
-        response = await self.make_api_request(f'/r/{self.subreddit}/new', params)
+        response = await self.make_api_request(self._new_endpoint, params)
         if response:
             if 'data' in response and 'children' in response['data']:
                 posts = response['data']['children']
-                self.logger.debug(f"Reddit: получено {len(posts)} постов из /r/{self.subreddit}/new")
+                self.logger.debug("Reddit: получено %s постов из %s", len(posts), self._new_endpoint)
                 return posts
             else:
-                self.logger.warning(f"Reddit: неожиданный формат ответа для /r/{self.subreddit}/new: {list(response.keys())}")
+                self.logger.warning("Reddit: неожиданный формат ответа для %s: %s", self._new_endpoint, list(response.keys()))
         else:
-            self.logger.warning(f"Reddit: пустой ответ от API для /r/{self.subreddit}/new")
+            self.logger.warning("Reddit: пустой ответ от API для %s", self._new_endpoint)
         return []
     
     async def get_post_comments(self, post_id: str, limit: int = 20) -> List[Dict]:
@@ -292,30 +227,32 @@ class RedditParser(BaseParser):
             'sort': 'new'
         }
         
-        response = await self.make_api_request(f'/r/{self.subreddit}/comments/{post_id}', params)
+        response = await self.make_api_request(self._comments_endpoint + post_id, params)
         if response and isinstance(response, list) and len(response) > 1:
             comments_data = response[1]['data']['children']
             return comments_data
         return []
     
-    def parse_comment(self, comment_data: Dict) -> Comment:
-        """Парсит данные комментария в объект Comment"""
+    def parse_comment(self, comment_data: Dict, depth: int = 0) -> Comment:
+        """Парсит данные комментария в объект Comment (depth - уровень вложенности ответа)"""
         data = comment_data.get('data', {})
+        get = data.get  # Все поля читаются из одного словаря
         
-        author = data.get('author', 'Unknown')
+        author = get('author', 'Unknown')
         if author == '[deleted]':
             author = 'Deleted User'
         
-        text = data.get('body', '').strip()
+        text = get('body', '').strip()
+        if depth and text:
+            text = f"{'↳ ' * depth}{text}"
         
-        created_utc = data.get('created_utc', 0)
         # Reddit возвращает timestamp в UTC, поэтому используем timezone.utc
-        from datetime import timezone
-        timestamp = datetime.fromtimestamp(created_utc, tz=timezone.utc).replace(tzinfo=None)
+        # (utcfromtimestamp устарел начиная с Python 3.12)
+        timestamp = datetime.fromtimestamp(get('created_utc', 0), tz=timezone.utc).replace(tzinfo=None)
         
-        comment_id = data.get('id', '')
-        post_id = data.get('link_id', '').replace('t3_', '')
-        source_url = f"https://reddit.com/r/{self.subreddit}/comments/{post_id}/_/{comment_id}/"
+        comment_id = get('id', '')
+        post_id = get('link_id', '').removeprefix('t3_')
+        source_url = self._url_prefix + post_id + '/_/' + comment_id + '/'
         
         return Comment(
             author=author,
@@ -325,77 +262,108 @@ class RedditParser(BaseParser):
             source_url=source_url
         )
     
-    async def get_comments(self, limit: int = 50) -> List[Comment]:
+    @staticmethod
+    def _walk_comments(root_children: List[Dict]) -> Iterator[Tuple[int, Dict]]:
+        """Обходит дерево комментариев в ширину, возвращая (глубина, комментарий) на любой глубине"""
+        queue = deque((0, child) for child in root_children)
+        while queue:
+            depth, comment_data = queue.popleft()
+            yield depth, comment_data
+            # Ответы разбираем даже у удаленного или старого комментария - они могут быть новыми
+            replies = comment_data.get('data', {}).get('replies')
+            if replies:  # Без ответов Reddit присылает пустую строку
+                queue.extend((depth + 1, child) for child in replies.get('data', {}).get('children', []))
+    
+    def _collect_comments(self, comments_data: List[Dict], since_ts: float, all_comments: List[Comment]):
+        """Разбирает комментарии одного поста со всеми ответами, пропуская удаленные и старые"""
+        for depth, comment_data in self._walk_comments(comments_data):
+            data = comment_data.get('data', {})
+            if data.get('body') == '[deleted]' or data.get('created_utc', 0) < since_ts:
+                continue
+            comment = self.parse_comment(comment_data, depth)
+            if comment.text:
+                all_comments.append(comment)
+    
+    async def get_comments(self, limit: int = 50, since: Optional[datetime] = None) -> List[Comment]:
         """Получает комментарии из Reddit с оптимизацией"""
         if not self.is_configured():
             self.logger.error("Reddit парсер не настроен")
             return []
         
-        # Небольшая случайная задержка (0-2 секунды) чтобы избежать одновременных запросов
-        # Это помогает избежать rate limiting когда несколько Reddit парсеров работают параллельно
-        delay = random.uniform(0, 2)
-        await asyncio.sleep(delay)
-        
         all_comments = []
+        # API комментариев Reddit не фильтрует по времени, поэтому старые комментарии
+        # отбрасываем по сырому полю created_utc, не создавая для них Comment
+        since_ts = _epoch(since)
+        
+        # Пока идет запрос списка постов, уже загружаем комментарии к постам прошлой проверки:
+        # на спокойных сабреддитах список почти не меняется, и это экономит один RTT
+        # Список запрашивается первым, чтобы первым получить слот семафора
+        posts_task = asyncio.create_task(self.get_subreddit_posts(limit=20))
+        speculative = {
+            post_id: asyncio.create_task(_settle(self.get_post_comments(post_id, limit=20)))
+            for post_id in self._recent_post_ids
+        }
         
         try:
             # Получаем последние посты из сабреддита
-            posts = await self.get_subreddit_posts(limit=20)
-            self.logger.info(f"Reddit: найдено {len(posts)} постов")
+            posts = await posts_task
+            self.logger.info("Reddit: найдено %s постов", len(posts))
             
             if not posts:
                 return []
             
-            # Параллельно получаем комментарии ко всем постам
-            tasks = []
-            for post in posts:
-                post_data = post.get('data', {})
-                post_id = post_data.get('id')
-                if post_id:
-                    tasks.append((post_id, self.get_post_comments(post_id, limit=20)))
-            
-            # Выполняем все запросы параллельно
-            results = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
+            # Параллельно получаем комментарии ко всем постам и разбираем каждый ответ
+            # сразу по готовности, не дожидаясь самого медленного запроса
+            post_ids = [post_id for post in posts if (post_id := post.get('data', {}).get('id'))]
+            self._recent_post_ids = post_ids
+            requests = [
+                (post_id, speculative.pop(post_id, None) or self.get_post_comments(post_id, limit=20))
+                for post_id in post_ids
+            ]
             
-            # Обрабатываем результаты
-            for i, (post_id, _) in enumerate(tasks):
-                if isinstance(results[i], Exception):
-                    self.logger.error(f"Ошибка при получении комментариев к посту {post_id}: {results[i]}")
-                    continue
-                
-                comments_data = results[i]
-                if comments_data:
-                    for comment_data in comments_data:
-                        if comment_data.get('data', {}).get('body') == '[deleted]':
-                            continue
-                        
-                        comment = self.parse_comment(comment_data)
-                        if comment.text:
-                            all_comments.append(comment)
-                        
-                        replies = comment_data.get('data', {}).get('replies', {})
-                        if replies and 'data' in replies and 'children' in replies['data']:
-                            for reply_data in replies['data']['children']:
-                                if reply_data.get('data', {}).get('body') != '[deleted]':
-                                    reply = self.parse_comment(reply_data)
-                                    if reply.text:
-                                        reply.text = f"↳ {reply.text}"
-                                        all_comments.append(reply)
+            async with aclosing(self._completed(requests)) as results:
+                async for post_id, comments_data in results:
+                    if isinstance(comments_data, Exception):
+                        self.logger.error("Ошибка при получении комментариев к посту %s: %s", post_id, comments_data)
+                        continue
+                    if comments_data:
+                        self._collect_comments(comments_data, since_ts, all_comments)
             
-            # Сортируем по времени (новые сначала)
-            all_comments.sort(key=lambda x: x.timestamp, reverse=True)
+            # Из одинаковых шаблонных комментариев оставляем только самый новый
+            unique_comments = []
+            form_letters: Dict[bytes, Comment] = {}
+            for comment in all_comments:
+                key = _form_letter_key(comment.text)
+                if key is None:
+                    unique_comments.append(comment)
+                else:
+                    kept = form_letters.get(key)
+                    if kept is None or comment.timestamp > kept.timestamp:
+                        form_letters[key] = comment
+            unique_comments.extend(form_letters.values())
+            if len(unique_comments) < len(all_comments):
+                self.logger.debug("Reddit: пропущено %s шаблонных комментариев", len(all_comments) - len(unique_comments))
+            all_comments = unique_comments
             
-            # Ограничиваем только по переданному limit
+            # Новые сначала, ограничиваем только по переданному limit
             # По требованиям: до 20 комментариев с каждого из 20 постов = до 400 комментариев с сабреддита
             # limit передается из main.py (20 для Reddit), но реально может быть больше комментариев
             # Поэтому используем limit как максимум, но не ограничиваем жестко до 20
-            result = all_comments[:limit] if limit else all_comments
-            self.logger.info(f"Reddit: получено {len(result)} комментариев из {len(all_comments)} найденных")
+            if limit:
+                result = _newest(all_comments, limit)
+            else:
+                result = sorted(all_comments, key=_BY_TIME, reverse=True)
+            self.logger.info("Reddit: получено %s комментариев из %s найденных", len(result), len(all_comments))
             return result
             
         except Exception as e:
-            self.logger.error(f"Ошибка при получении комментариев Reddit: {e}")
+            self.logger.error("Ошибка при получении комментариев Reddit: %s", e)
             return []
+        finally:
+            # Упреждающие запросы к постам, выпавшим из нового списка, больше не нужны
+            posts_task.cancel()
+            for task in speculative.values():
+                task.cancel()
 
 # Функция для создания Reddit парсера
 def create_reddit_parser(client_id: str, client_secret: str, user_agent: str, subreddit: str) -> RedditParser:
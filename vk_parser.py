@@ -4,143 +4,31 @@
 """
 
 import asyncio
-import aiohttp
-import logging
+import time
+from contextlib import aclosing
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from abc import ABC, abstractmethod
-import ssl
+from typing import List, Dict, Any, Optional, Tuple
 
-class Comment:
-    """Класс для представления комментария"""
-    def __init__(self, author: str, text: str, source: str, timestamp: datetime, source_url: str = ""):
-        self.author = author
-        self.text = text
-        self.source = source
-        self.timestamp = timestamp
-        self.source_url = source_url
-    
-    def __str__(self):
-        return f"[{self.source}] {self.author}: {self.text[:50]}..."
+from base_parser import BaseParser, Comment, _epoch, _newest
 
-class BaseParser(ABC):
-    """Базовый класс для всех парсеров социальных сетей"""
-    
-    def __init__(self, source_name: str):
-        self.source_name = source_name
-        self.logger = logging.getLogger(f"parser.{source_name}")
-        self.last_check_time = None
-        self.processed_comments = set()
-        self._session = None  # Переиспользуемая сессия
-    
-    @abstractmethod
-    async def get_comments(self, limit: int = 50) -> List[Comment]:
-        """Получает комментарии из социальной сети"""
-        pass
-    
-    @abstractmethod
-    def is_configured(self) -> bool:
-        """Проверяет, настроен ли парсер"""
-        pass
-    
-    async def _get_session(self) -> aiohttp.ClientSession:
-        """Получает или создает переиспользуемую HTTP сессию"""
-        if self._session is None or self._session.closed:
-            # Создаем SSL контекст для обхода проблем с сертификатами
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            connector = aiohttp.TCPConnector(
-                ssl=ssl_context,
-                limit=100,  # Максимум соединений
-                limit_per_host=30,  # Максимум на один хост
-                ttl_dns_cache=300  # Кэш DNS на 5 минут
-            )
-            timeout = aiohttp.ClientTimeout(total=30, connect=10)
-            self._session = aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            )
-        return self._session
-    
-    async def close_session(self):
-        """Закрывает HTTP сессию"""
-        if self._session and not self._session.closed:
-            await self._session.close()
-    
-    async def make_request_with_retry(
-        self,
-        method: str,
-        url: str,
-        max_retries: int = 3,
-        **kwargs
-    ) -> Optional[Dict]:
-        """Выполняет HTTP запрос с повторными попытками и возвращает JSON"""
-        session = await self._get_session()
-        
-        for attempt in range(max_retries):
-            try:
-                async with session.request(method, url, **kwargs) as response:
-                    if response.status == 200:
-                        try:
-                            data = await response.json()
-                            return data
-                        except Exception as e:
-                            self.logger.error(f"Ошибка парсинга JSON ответа: {e}")
-                            if attempt < max_retries - 1:
-                                wait_time = 2 ** attempt
-                                await asyncio.sleep(wait_time)
-                                continue
-                            return None
-                    elif response.status in [429, 500, 502, 503, 504]:  # Временные ошибки
-                        if attempt < max_retries - 1:
-                            wait_time = 2 ** attempt  # Exponential backoff
-                            self.logger.warning(
-                                f"Получен статус {response.status}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                            )
-                            await asyncio.sleep(wait_time)
-                            continue
-                    else:
-                        self.logger.error(f"HTTP ошибка {response.status} при запросе к {url}")
-                        return None
-            except asyncio.TimeoutError:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    self.logger.warning(f"Таймаут запроса, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Таймаут запроса к {url} после {max_retries} попыток")
-                    return None
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    self.logger.warning(f"Ошибка запроса: {e}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Ошибка запроса к {url}: {e}")
-                    return None
-        
-        return None
-    
-    def get_unique_id(self, comment: Comment) -> str:
-        """Создает уникальный ID для комментария"""
-        return f"{comment.source}_{comment.author}_{comment.timestamp}_{hash(comment.text)}"
-    
-    def is_new_comment(self, comment: Comment) -> bool:
-        """Проверяет, является ли комментарий новым"""
-        comment_id = self.get_unique_id(comment)
-        if comment_id in self.processed_comments:
-            return False
-        
-        self.processed_comments.add(comment_id)
-        return True
+# Ограничение одновременных запросов к api.vk.com: ответы разбираются по готовности,
+# а лишние запросы ждут слота, не увеличивая число 429 при общей квоте
+VK_MAX_CONCURRENCY = 8
+_HOST_SEMAPHORE = asyncio.Semaphore(VK_MAX_CONCURRENCY)
+
+def _has_text(comment_data: Dict) -> bool:
+    """Есть ли у комментария текст (у удаленных и состоящих из одних вложений его нет)"""
+    text = comment_data.get('text')
+    return bool(text) and not text.isspace()
+
+PROFILES_CACHE_LIMIT = 10_000  # Сколько профилей авторов держим в кэше VKParser.profiles
+POSTS_CACHE_TTL = 60  # Секунд переиспользуем список постов wall.get (новый пост виден с задержкой до TTL)
 
 class VKParser(BaseParser):
     """Улучшенный парсер комментариев VK через API"""
     
+    _host_semaphore = _HOST_SEMAPHORE
+    
     def __init__(self, access_token: str, group_id: str, group_url: str = ""):
         super().__init__("VK")
         self.access_token = access_token
@@ -149,18 +37,43 @@ class VKParser(BaseParser):
         self.api_version = "5.131"
         self.base_url = "https://api.vk.com/method"
         self.profiles = {}  # Кэш профилей пользователей
+        # post_id -> максимальный ID комментария, уже виденный в ответах wall.getComments
+        # (ID комментариев на стене растут, поэтому все, что не больше, уже разобрано)
+        self._post_highwater: Dict[int, int] = {}
+        # (момент загрузки по time.monotonic, count, посты) последнего успешного wall.get
+        self._posts_cache: Optional[Tuple[float, int, List[Dict]]] = None
+        
+        # Неизменные части запросов собираются один раз, а не на каждый из 20+ параллельных вызовов
+        self._owner_id = group_id if group_id.startswith('-') else f"-{group_id}"
+        self._base_params = {'access_token': access_token, 'v': self.api_version}
+        self._method_urls = {m: f"{self.base_url}/{m}" for m in ('wall.get', 'wall.getComments')}
+        # Постоянные части ссылок на комментарии: в parse_comment подставляются только ID
+        # (ID числовые и не требуют экранирования; group_url может уже содержать query или #якорь)
+        page_url = group_url.partition('#')[0]
+        self._reply_url_prefix = f"{page_url}{'&' if '?' in page_url else '?'}reply="
+        self._wall_url_part = f"&w=wall-{group_id}_"
+        self._wall_get_params = {
+            **self._base_params,
+            'owner_id': self._owner_id,
+            'filter': 'owner',
+            'extended': 0
+        }
+        self._comments_params = {
+            **self._base_params,
+            'owner_id': self._owner_id,
+            'sort': 'desc',
+            'extended': 1,
+            'fields': 'id,first_name,last_name,screen_name',
+            'thread_items_count': 10
+        }
         
     def is_configured(self) -> bool:
         """Проверяет, настроен ли парсер VK"""
         return bool(self.access_token and self.group_id)
     
     async def make_api_request(self, method: str, params: Dict[str, Any]) -> Optional[Dict]:
-        """Выполняет запрос к VK API с retry логикой"""
-        url = f"{self.base_url}/{method}"
-        params.update({
-            'access_token': self.access_token,
-            'v': self.api_version
-        })
+        """Выполняет запрос к VK API с retry логикой (params уже содержат self._base_params)"""
+        url = self._method_urls.get(method) or f"{self.base_url}/{method}"
         
         data = await self.make_request_with_retry('GET', url, params=params)
         if data:
@@ -170,25 +83,25 @@ class VKParser(BaseParser):
             return data.get('response')
         return None
     
-    async def get_group_posts(self, count: int = 20) -> List[Dict]:
-        """Получает последние посты группы"""
+    async def get_group_posts(self, count: int = 20, force: bool = False) -> List[Dict]:
+        """Получает последние посты группы (кэшируется на POSTS_CACHE_TTL, force - запросить заново)"""
         if not self.is_configured():
             self.logger.error("VK парсер не настроен")
             return []
         
-        group_id = self.group_id
-        if not group_id.startswith('-'):
-            group_id = f"-{group_id}"
+        # Список постов меняется редко, а проверки идут каждые 30 секунд:
+        # из кэша fan-out wall.getComments стартует без лишнего RTT и запроса к API
+        now = time.monotonic()
+        if not force and self._posts_cache is not None:
+            loaded_at, cached_count, cached_posts = self._posts_cache
+            if cached_count == count and now - loaded_at < POSTS_CACHE_TTL:
+                return cached_posts
         
-        params = {
-            'owner_id': group_id,
-            'count': count,
-            'filter': 'owner',
-            'extended': 0
-        }
+        params = {**self._wall_get_params, 'count': count}
         
         response = await self.make_api_request('wall.get', params)
         if response and 'items' in response:
+            self._posts_cache = (now, count, response['items'])
             return response['items']
         return []
     
@@ -197,28 +110,20 @@ class VKParser(BaseParser):
         if not self.is_configured():
             return []
         
-        group_id = self.group_id
-        if not group_id.startswith('-'):
-            group_id = f"-{group_id}"
-        
-        params = {
-            'owner_id': group_id,
-            'post_id': post_id,
-            'count': count,
-            'sort': 'desc',
-            'extended': 1,
-            'fields': 'id,first_name,last_name,screen_name',
-            'thread_items_count': 10
-        }
+        params = {**self._comments_params, 'post_id': post_id, 'count': count}
         
         response = await self.make_api_request('wall.getComments', params)
         if response and 'items' in response:
             if 'profiles' in response:
-                self.profiles = {p['id']: p for p in response['profiles']}
+                # Ответы по постам приходят параллельно, поэтому профили дополняют общий кэш,
+                # а не заменяют его профилями последнего ответа
+                if len(self.profiles) > PROFILES_CACHE_LIMIT:
+                    self.profiles.clear()
+                self.profiles.update((p['id'], p) for p in response['profiles'])
             return response['items']
         return []
     
-    def parse_comment(self, comment_data: Dict, profiles: Dict = None, post_id: str = None) -> Comment:
+    def parse_comment(self, comment_data: Dict, profiles: Dict = None, post_id: str = None, is_reply: bool = False) -> Comment:
         """Парсит данные комментария в объект Comment"""
         author_name = "Неизвестный"
         if profiles and comment_data.get('from_id') in profiles:
@@ -230,13 +135,17 @@ class VKParser(BaseParser):
             author_name = f"ID{comment_data['from_id']}"
         
         text = comment_data.get('text', '').strip()
+        if is_reply and text:
+            text = f"↳ {text}"
         timestamp = datetime.fromtimestamp(comment_data.get('date', 0))
         
         comment_id = comment_data.get('id', '')
-        if post_id and self.group_url:
-            source_url = f"{self.group_url}?reply={comment_id}&w=wall-{self.group_id}_{post_id}"
+        if not self.group_url:
+            source_url = ""
+        elif post_id:
+            source_url = f"{self._reply_url_prefix}{comment_id}{self._wall_url_part}{post_id}"
         else:
-            source_url = f"{self.group_url}?reply={comment_id}" if self.group_url else ""
+            source_url = f"{self._reply_url_prefix}{comment_id}"
         
         return Comment(
             author=author_name,
@@ -246,13 +155,16 @@ class VKParser(BaseParser):
             source_url=source_url
         )
     
-    async def get_comments(self, limit: int = 50) -> List[Comment]:
+    async def get_comments(self, limit: int = 50, since: Optional[datetime] = None) -> List[Comment]:
         """Получает комментарии из VK с оптимизацией"""
         if not self.is_configured():
             self.logger.error("VK парсер не настроен")
             return []
         
         all_comments = []
+        # wall.getComments не фильтрует по времени, поэтому старые комментарии
+        # отбрасываем по сырому полю date, не создавая для них Comment
+        since_ts = _epoch(since)
         
         try:
             # Получаем последние посты группы
@@ -262,42 +174,48 @@ class VKParser(BaseParser):
             if not posts:
                 return []
             
-            # Параллельно получаем комментарии ко всем постам
-            tasks = []
-            for post in posts:
-                post_id = post.get('id')
-                if post_id:
-                    task = self.get_post_comments(str(post_id), count=30)
-                    tasks.append((post_id, task))
-            
-            # Выполняем все запросы параллельно
-            results = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
+            # Параллельно получаем комментарии ко всем постам и разбираем каждый ответ
+            # сразу по готовности, не дожидаясь самого медленного запроса
+            post_ids = [post_id for post in posts if (post_id := post.get('id'))]
+            requests = ((post_id, self.get_post_comments(str(post_id), count=30)) for post_id in post_ids)
             
             # Обрабатываем результаты
-            for i, (post_id, _) in enumerate(tasks):
-                if isinstance(results[i], Exception):
-                    self.logger.error(f"Ошибка при получении комментариев к посту {post_id}: {results[i]}")
-                    continue
-                
-                comments_data = results[i]
-                if comments_data:
-                    for comment_data in comments_data:
-                        comment = self.parse_comment(comment_data, self.profiles, post_id)
-                        if comment.text:
-                            all_comments.append(comment)
-                        
-                        thread = comment_data.get('thread', {})
-                        if thread and 'items' in thread:
-                            for reply_data in thread['items']:
-                                reply = self.parse_comment(reply_data, self.profiles, post_id)
-                                if reply.text:
-                                    reply.text = f"↳ {reply.text}"
-                                    all_comments.append(reply)
+            # Комментарии с ID не больше прошлого максимума по посту уже разбирались
+            # на предыдущих проверках и пропускаются без создания Comment
+            post_highwater = {post_id: self._post_highwater.get(post_id, 0) for post_id in post_ids}
+            async with aclosing(self._completed(requests)) as results:
+                async for post_id, comments_data in results:
+                    if isinstance(comments_data, Exception):
+                        self.logger.error(f"Ошибка при получении комментариев к посту {post_id}: {comments_data}")
+                        continue
+                    
+                    highwater = post_highwater[post_id]
+                    if comments_data:
+                        max_id = highwater
+                        for comment_data in comments_data:
+                            comment_id = comment_data.get('id', 0)
+                            if comment_id > highwater:
+                                max_id = max(max_id, comment_id)
+                                if comment_data.get('date', 0) >= since_ts and _has_text(comment_data):
+                                    all_comments.append(self.parse_comment(comment_data, self.profiles, post_id))
+                            
+                            # Ответы проверяем даже у старого комментария - они могут быть новыми
+                            thread = comment_data.get('thread', {})
+                            if thread and 'items' in thread:
+                                for reply_data in thread['items']:
+                                    reply_id = reply_data.get('id', 0)
+                                    if reply_id <= highwater:
+                                        continue
+                                    max_id = max(max_id, reply_id)
+                                    if reply_data.get('date', 0) < since_ts or not _has_text(reply_data):
+                                        continue
+                                    all_comments.append(self.parse_comment(reply_data, self.profiles, post_id, is_reply=True))
+                        post_highwater[post_id] = max_id
             
-            # Сортируем по времени (новые сначала)
-            all_comments.sort(key=lambda x: x.timestamp, reverse=True)
+            # Хранятся только текущие посты, ушедшие из выдачи wall.get забываются
+            self._post_highwater = post_highwater
             
-            result = all_comments[:limit]
+            result = _newest(all_comments, limit)
             self.logger.info(f"VK: получено {len(result)} комментариев")
             return result
             
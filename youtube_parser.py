@@ -5,165 +5,46 @@
 
 import asyncio
 import aiohttp
-import logging
+import orjson
+import time
+from contextlib import aclosing
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from abc import ABC, abstractmethod
-import ssl
 
-class YouTubeQuotaExceeded(Exception):
-    """Превышена дневная квота YouTube API"""
-    pass
+from base_parser import BaseParser, Comment, YouTubeQuotaExceeded, _epoch, _newest
 
-class Comment:
-    """Класс для представления комментария"""
-    def __init__(self, author: str, text: str, source: str, timestamp: datetime, source_url: str = ""):
-        self.author = author
-        self.text = text
-        self.source = source
-        self.timestamp = timestamp
-        self.source_url = source_url
-    
-    def __str__(self):
-        return f"[{self.source}] {self.author}: {self.text[:50]}..."
+# Ограничение одновременных запросов к googleapis.com: ответы разбираются по готовности,
+# а лишние запросы ждут слота, не увеличивая число 429 при общей квоте
+YOUTUBE_MAX_CONCURRENCY = 8
+_HOST_SEMAPHORE = asyncio.Semaphore(YOUTUBE_MAX_CONCURRENCY)
 
-class BaseParser(ABC):
-    """Базовый класс для всех парсеров социальных сетей"""
-    
-    def __init__(self, source_name: str):
-        self.source_name = source_name
-        self.logger = logging.getLogger(f"parser.{source_name}")
-        self.last_check_time = None
-        self.processed_comments = set()
-        self._session = None
-    
-    @abstractmethod
-    async def get_comments(self, limit: int = 50) -> List[Comment]:
-        """Получает комментарии из социальной сети"""
-        pass
-    
-    @abstractmethod
-    def is_configured(self) -> bool:
-        """Проверяет, настроен ли парсер"""
-        pass
-    
-    async def _get_session(self) -> aiohttp.ClientSession:
-        """Получает или создает переиспользуемую HTTP сессию"""
-        if self._session is None or self._session.closed:
-            connector = aiohttp.TCPConnector(
-                limit=100,
-                limit_per_host=30,
-                ttl_dns_cache=300
-            )
-            timeout = aiohttp.ClientTimeout(total=30, connect=10)
-            self._session = aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            )
-        return self._session
-    
-    async def close_session(self):
-        """Закрывает HTTP сессию"""
-        if self._session and not self._session.closed:
-            await self._session.close()
-    
-    async def make_request_with_retry(
-        self,
-        method: str,
-        url: str,
-        max_retries: int = 3,
-        **kwargs
-    ) -> Optional[Dict]:
-        """Выполняет HTTP запрос с повторными попытками и возвращает JSON"""
-        session = await self._get_session()
-        
-        for attempt in range(max_retries):
-            try:
-                async with session.request(method, url, **kwargs) as response:
-                    if response.status == 200:
-                        try:
-                            data = await response.json()
-                            return data
-                        except Exception as e:
-                            self.logger.error(f"Ошибка парсинга JSON ответа: {e}")
-                            if attempt < max_retries - 1:
-                                wait_time = 2 ** attempt
-                                await asyncio.sleep(wait_time)
-                                continue
-                            return None
-                    elif response.status == 403:
-                        # Проверяем, не превышена ли квота YouTube API
-                        try:
-                            error_data = await response.json()
-                            error_reason = error_data.get('error', {}).get('errors', [{}])[0].get('reason', '')
-                            if error_reason == 'quotaExceeded':
-                                error_msg = (
-                                    "⚠️ YouTube API: превышена дневная квота (10,000 единиц). "
-                                    "Квота обновится через 24 часа. YouTube парсер временно отключен."
-                                )
-                                self.logger.error(error_msg)
-                                # Бросаем исключение, чтобы его можно было обработать в main.py
-                                raise YouTubeQuotaExceeded(error_msg)
-                        except YouTubeQuotaExceeded:
-                            # Пробрасываем исключение дальше
-                            raise
-                        except:
-                            # Для других ошибок парсинга просто продолжаем
-                            pass
-                        # Для других 403 ошибок просто логируем
-                        self.logger.error(f"HTTP ошибка 403 при запросе к {url}")
-                        return None
-                    elif response.status in [429, 500, 502, 503, 504]:
-                        if attempt < max_retries - 1:
-                            wait_time = 2 ** attempt
-                            self.logger.warning(
-                                f"Статус {response.status}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})"
-                            )
-                            await asyncio.sleep(wait_time)
-                            continue
-                    else:
-                        self.logger.error(f"HTTP ошибка {response.status} при запросе к {url}")
-                        return None
-            except YouTubeQuotaExceeded:
-                # Пробрасываем исключение квоты дальше, не делаем retry
-                raise
-            except asyncio.TimeoutError:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    self.logger.warning(f"Таймаут запроса, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Таймаут запроса к {url} после {max_retries} попыток")
-                    return None
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    self.logger.warning(f"Ошибка запроса: {e}, повтор через {wait_time}с (попытка {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"Ошибка запроса к {url}: {e}")
-                    return None
-        
-        return None
-    
-    def get_unique_id(self, comment: Comment) -> str:
-        """Создает уникальный ID для комментария"""
-        return f"{comment.source}_{comment.author}_{comment.timestamp}_{hash(comment.text)}"
-    
-    def is_new_comment(self, comment: Comment) -> bool:
-        """Проверяет, является ли комментарий новым"""
-        comment_id = self.get_unique_id(comment)
-        if comment_id in self.processed_comments:
-            return False
-        
-        self.processed_comments.add(comment_id)
-        return True
+# Partial response: API отдает только поля, которые читает _parse_thread_item,
+# вместо полного snippet (channelId, authorProfileImageUrl, textOriginal, likeCount, ...)
+_COMMENT_SNIPPET = 'snippet(authorDisplayName,textDisplay,publishedAt)'
+COMMENT_THREAD_FIELDS = (
+    f"items(id,snippet/topLevelComment/{_COMMENT_SNIPPET},"
+    f"replies/comments(id,{_COMMENT_SNIPPET}))"
+)
+# То же для выборки по всему каналу, плюс videoId для ссылки на комментарий
+CHANNEL_THREAD_FIELDS = (
+    f"items(id,snippet(videoId,topLevelComment/{_COMMENT_SNIPPET}),"
+    f"replies/comments(id,{_COMMENT_SNIPPET}))"
+)
+CHANNEL_THREADS_MAX_RESULTS = 100  # Максимум API за один запрос (1 единица квоты при любом размере)
+
+_WATCH_URL = "https://www.youtube.com/watch?v="  # Начало ссылки на комментарий, дальше ID видео и &lc=
+
+def _uploads_playlist_id(channel_id: str) -> Optional[str]:
+    """ID плейлиста 'Uploads' по ID канала без запроса к API (None, если ID не вида UC...)"""
+    if channel_id.startswith('UC') and len(channel_id) > 2:
+        return 'UU' + channel_id[2:]
+    return None
 
 class YouTubeParser(BaseParser):
     """Улучшенный парсер комментариев YouTube через API"""
     
+    _host_semaphore = _HOST_SEMAPHORE
+    
     def __init__(self, api_key: str, channel_id: str):
         super().__init__("YouTube")
         self.api_key = api_key
@@ -176,6 +57,23 @@ class YouTubeParser(BaseParser):
         """Проверяет, настроен ли парсер YouTube"""
         return bool(self.api_key and self.channel_id)
     
+    async def _check_forbidden(self, response: aiohttp.ClientResponse):
+        """Проверяет, не превышена ли квота YouTube API (тогда бросает YouTubeQuotaExceeded)"""
+        try:
+            error_data = orjson.loads(await response.read())
+            error_reason = error_data.get('error', {}).get('errors', [{}])[0].get('reason', '')
+        except Exception:
+            # Для других ошибок парсинга просто продолжаем
+            return
+        if error_reason == 'quotaExceeded':
+            error_msg = (
+                "⚠️ YouTube API: превышена дневная квота (10,000 единиц). "
+                "Квота обновится через 24 часа. YouTube парсер временно отключен."
+            )
+            self.logger.error(error_msg)
+            # Бросаем исключение, чтобы его можно было обработать в main.py
+            raise YouTubeQuotaExceeded(error_msg)
+    
     async def get_channel_id_by_username(self, username: str) -> str:
         """Получает ID канала по username"""
         try:
@@ -211,6 +109,12 @@ class YouTubeParser(BaseParser):
                     else:
                         return None
                 
+                # У любого канала UC<id> плейлист загрузок - UU<id>: channels.list не нужен
+                uploads_playlist_id = _uploads_playlist_id(self.channel_id)
+                if uploads_playlist_id:
+                    self._uploads_playlist_id = uploads_playlist_id
+                    return self._uploads_playlist_id
+                
                 url = f"{self.base_url}/channels"
                 params = {
                     'part': 'contentDetails',
@@ -264,8 +168,94 @@ class YouTubeParser(BaseParser):
             self.logger.error(f"Ошибка при получении списка видео: {e}")
             return []
     
-    async def get_video_comments(self, video_id: str, limit: int = 20) -> List[Comment]:
-        """Получает комментарии к конкретному видео включая ответы"""
+    def _parse_thread_item(self, item: Dict[str, Any], video_id: str, since_ts: float, comments: List[Comment]):
+        """Добавляет в comments верхний комментарий ветки и ответы на него (старше since_ts пропускаются)"""
+        top_comment = item['snippet']['topLevelComment']['snippet']
+        # Ссылка на видео общая для комментария и ответов (ID видео и комментариев URL-безопасны)
+        url_prefix = f"{_WATCH_URL}{video_id}&lc="
+        
+        # С Python 3.11 fromisoformat (C реализация) сам принимает суффикс Z
+        published_at = datetime.fromisoformat(top_comment['publishedAt'])
+        
+        published_ts = published_at.timestamp()
+        if published_ts >= since_ts:
+            # Используем timestamp комментария в секундах для параметра t
+            comment_timestamp = int(published_ts)
+            source_url = f"{url_prefix}{item['id']}&t={comment_timestamp}s"
+            
+            comment = Comment(
+                author=top_comment['authorDisplayName'],
+                text=top_comment['textDisplay'],
+                source=self.source_name,
+                timestamp=published_at,
+                source_url=source_url
+            )
+            
+            comments.append(comment)
+        
+        # Ответы проверяем даже у старого комментария - они могут быть новыми
+        if 'replies' in item and 'comments' in item['replies']:
+            for reply in item['replies']['comments']:
+                reply_snippet = reply['snippet']
+                
+                reply_published_at = datetime.fromisoformat(reply_snippet['publishedAt'])
+                reply_published_ts = reply_published_at.timestamp()
+                if reply_published_ts < since_ts:
+                    continue
+                
+                # Используем timestamp комментария в секундах для параметра t
+                reply_timestamp = int(reply_published_ts)
+                reply_source_url = f"{url_prefix}{reply['id']}&t={reply_timestamp}s"
+                
+                reply_comment = Comment(
+                    author=reply_snippet['authorDisplayName'],
+                    text=f"↳ {reply_snippet['textDisplay']}",
+                    source=self.source_name,
+                    timestamp=reply_published_at,
+                    source_url=reply_source_url
+                )
+                
+                comments.append(reply_comment)
+    
+    async def get_channel_comment_threads(self, since_ts: float = 0.0) -> Optional[List[Comment]]:
+        """Получает последние комментарии со всех видео канала одним запросом (None - запрос не удался)"""
+        try:
+            # allThreadsRelatedToChannelId принимает только ID канала (UC...),
+            # username заменяется на ID внутри get_uploads_playlist_id
+            if not self.channel_id.startswith('UC'):
+                await self.get_uploads_playlist_id()
+                if not self.channel_id.startswith('UC'):
+                    return None
+            
+            url = f"{self.base_url}/commentThreads"
+            params = {
+                'part': 'snippet,replies',
+                'allThreadsRelatedToChannelId': self.channel_id,
+                'maxResults': CHANNEL_THREADS_MAX_RESULTS,
+                'order': 'time',
+                'fields': CHANNEL_THREAD_FIELDS,
+                'key': self.api_key
+            }
+            
+            data = await self.make_request_with_retry('GET', url, params=params)
+            if data is None:
+                return None
+            
+            comments = []
+            for item in data.get('items', []):
+                # Ветки без videoId (обсуждения канала) не привязаны к видео
+                video_id = item['snippet'].get('videoId')
+                if video_id:
+                    self._parse_thread_item(item, video_id, since_ts, comments)
+            return comments
+        except YouTubeQuotaExceeded:
+            raise
+        except Exception as e:
+            self.logger.error(f"Ошибка при получении комментариев канала: {e}")
+            return None
+    
+    async def get_video_comments(self, video_id: str, limit: int = 20, since_ts: float = 0.0) -> List[Comment]:
+        """Получает комментарии к конкретному видео включая ответы (старше since_ts пропускаются)"""
         try:
             url = f"{self.base_url}/commentThreads"
             params = {
@@ -273,6 +263,7 @@ class YouTubeParser(BaseParser):
                 'videoId': video_id,
                 'maxResults': limit,
                 'order': 'time',
+                'fields': COMMENT_THREAD_FIELDS,
                 'key': self.api_key
             }
             
@@ -282,47 +273,7 @@ class YouTubeParser(BaseParser):
             if data:
                 try:
                     for item in data.get('items', []):
-                        top_comment = item['snippet']['topLevelComment']['snippet']
-                        
-                        published_at = datetime.fromisoformat(
-                            top_comment['publishedAt'].replace('Z', '+00:00')
-                        )
-                        
-                        # Используем timestamp комментария в секундах для параметра t
-                        comment_timestamp = int(published_at.timestamp())
-                        source_url = f"https://www.youtube.com/watch?v={video_id}&lc={item['id']}&t={comment_timestamp}s"
-                        
-                        comment = Comment(
-                            author=top_comment['authorDisplayName'],
-                            text=top_comment['textDisplay'],
-                            source=self.source_name,
-                            timestamp=published_at,
-                            source_url=source_url
-                        )
-                        
-                        comments.append(comment)
-                        
-                        if 'replies' in item and 'comments' in item['replies']:
-                            for reply in item['replies']['comments']:
-                                reply_snippet = reply['snippet']
-                                
-                                reply_published_at = datetime.fromisoformat(
-                                    reply_snippet['publishedAt'].replace('Z', '+00:00')
-                                )
-                                
-                                # Используем timestamp комментария в секундах для параметра t
-                                reply_timestamp = int(reply_published_at.timestamp())
-                                reply_source_url = f"https://www.youtube.com/watch?v={video_id}&lc={reply['id']}&t={reply_timestamp}s"
-                                
-                                reply_comment = Comment(
-                                    author=reply_snippet['authorDisplayName'],
-                                    text=f"↳ {reply_snippet['textDisplay']}",
-                                    source=self.source_name,
-                                    timestamp=reply_published_at,
-                                    source_url=reply_source_url
-                                )
-                                
-                                comments.append(reply_comment)
+                        self._parse_thread_item(item, video_id, since_ts, comments)
                 except Exception as e:
                     self.logger.error(f"Ошибка обработки комментариев YouTube: {e}")
             
@@ -334,47 +285,59 @@ class YouTubeParser(BaseParser):
             self.logger.error(f"Ошибка при получении комментариев к видео {video_id}: {e}")
             return []
     
-    async def get_comments(self, limit: int = 50) -> List[Comment]:
-        """Получает комментарии из YouTube с оптимизацией"""
-        if not self.is_configured():
-            self.logger.error("YouTube парсер не настроен")
-            return []
-        
+    async def _get_comments_per_video(self, since_ts: float) -> List[Comment]:
+        """Запасной путь: комментарии к последним видео канала, по запросу на видео"""
         all_comments = []
+        start_time = time.time()
         
-        try:
-            import time
-            start_time = time.time()
-            
-            # Получаем список видео
-            video_ids = await self.get_video_ids(limit=20)
-            video_ids_time = time.time() - start_time
-            
-            if not video_ids:
-                return []
-            
-            # Параллельно получаем комментарии ко всем видео
-            comments_start_time = time.time()
-            tasks = [self.get_video_comments(video_id, limit=30) for video_id in video_ids]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            comments_time = time.time() - comments_start_time
-            
-            self.logger.debug(f"YouTube: получение списка видео: {video_ids_time:.2f}с, комментарии: {comments_time:.2f}с")
-            
-            # Обрабатываем результаты
-            for i, result in enumerate(results):
+        # Получаем список видео
+        video_ids = await self.get_video_ids(limit=20)
+        video_ids_time = time.time() - start_time
+        
+        if not video_ids:
+            return []
+        
+        # Параллельно получаем комментарии ко всем видео и забираем каждый ответ
+        # сразу по готовности, не дожидаясь самого медленного запроса
+        comments_start_time = time.time()
+        requests = ((video_id, self.get_video_comments(video_id, limit=30, since_ts=since_ts)) for video_id in video_ids)
+        # При исчерпании квоты остальные запросы уже не нужны: выход из aclosing их отменяет
+        async with aclosing(self._completed(requests)) as results:
+            async for video_id, result in results:
                 if isinstance(result, YouTubeQuotaExceeded):
                     # Если квота исчерпана, пробрасываем исключение дальше
                     raise result
                 elif isinstance(result, Exception):
-                    self.logger.error(f"Ошибка при получении комментариев к видео {video_ids[i]}: {result}")
+                    self.logger.error(f"Ошибка при получении комментариев к видео {video_id}: {result}")
                     continue
                 all_comments.extend(result)
+        comments_time = time.time() - comments_start_time
+        
+        self.logger.debug(f"YouTube: получение списка видео: {video_ids_time:.2f}с, комментарии: {comments_time:.2f}с")
+        
+        return all_comments
+    
+    async def get_comments(self, limit: int = 50, since: Optional[datetime] = None) -> List[Comment]:
+        """Получает комментарии из YouTube с оптимизацией"""
+        if not self.is_configured():
+            self.logger.error("YouTube парсер не настроен")
+            return []
+        
+        try:
+            start_time = time.time()
+            since_ts = _epoch(since)
             
-            # Сортируем по времени (новые сначала)
-            all_comments.sort(key=lambda x: x.timestamp, reverse=True)
+            # Один запрос по всему каналу вместо playlistItems + запроса на каждое видео
+            # commentThreads не поддерживает publishedAfter, поэтому старые комментарии
+            # пропускаются при разборе ответа, без создания Comment
+            channel_comments = await self.get_channel_comment_threads(since_ts)
+            if channel_comments is not None:
+                self.logger.debug(f"YouTube: комментарии канала: {time.time() - start_time:.2f}с")
+                all_comments = channel_comments
+            else:
+                all_comments = await self._get_comments_per_video(since_ts)
             
-            return all_comments[:limit]
+            return _newest(all_comments, limit)
             
         except YouTubeQuotaExceeded:
             # Пробрасываем исключение квоты дальше, чтобы его можно было обработать в main.py